@@ -1,7 +1,31 @@
 import argparse
+import itertools
+import os
+import socket
 import time
+import uuid
 
-from utils import STREAM_KEY, build_smart_context, get_ai_response, publish_message, r
+import metrics
+import review
+from llm_client import LLMError
+from utils import (
+    build_smart_context,
+    ensure_group,
+    get_ai_response,
+    get_latest_content,
+    get_message_content,
+    inbox_key,
+    publish_chunk,
+    publish_message,
+    r,
+)
+
+# Consumer group : une entrée idle plus longtemps que ça est reprise par un autre worker
+CLAIM_IDLE_MS = int(os.getenv("AGENT_CLAIM_IDLE_MS", "300000"))
+CLAIM_INTERVAL = float(os.getenv("AGENT_CLAIM_INTERVAL", "30"))
+MAX_DELIVERIES = int(os.getenv("AGENT_MAX_DELIVERIES", "3"))
+# Rôles dont les réponses sont diffusées fragment par fragment (status STREAMING)
+STREAM_ROLES = [x.strip() for x in os.getenv("STREAM_ROLES", "coder").split(",") if x.strip()]
 
 ROLES_CONFIG = {
     "analyst": """
@@ -19,6 +43,7 @@ ROLES_CONFIG = {
     "coder": """
     ROLE: Python Dev.
     OUTPUT: Full Code in ```python ... ``` blocks.
+    FORMAT: First line of each block: # Nom du fichier: <path>
     CONSTRAINTS: 
     - NO EXPLANATIONS.
     - NO "Here is the code".
@@ -32,40 +57,141 @@ ROLES_CONFIG = {
 }
 
 
-def run_agent(role):
-    print(f"👤 AGENT {role.upper()} (SILENT MODE)", flush=True)
+def get_group_name(role):
+    return f"workers:{role}"
+
+
+def get_default_consumer():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def publish_failure(role, data, task, error, stream_id=None):
+    """Statut ERROR avec la commande échouée : le manager la renvoie ou arrête le projet."""
+    fields = {"task": task}
+    if data.get("file"):
+        fields["file"] = data["file"]
+    publish_message(
+        role,
+        error,
+        "error",
+        data["request_id"],
+        status="ERROR",
+        stream_id=stream_id,
+        fields=fields,
+    )
+
+
+def handle_message(role, data):
+    """Traite une commande de l'inbox du rôle (toujours adressée à ce rôle)."""
     system_prompt = ROLES_CONFIG.get(role, "")
-    my_tag = f"@{role.capitalize()}"
-    last_id = "$"
+
+    sender = data.get("sender", "")
+    req_id = data.get("request_id")
+    status = data.get("status", "DONE")
+
+    if sender == role or not req_id or status != "DONE":
+        return
+    content = get_message_content(data)
+
+    print(f"⚡ [{role}] Processing...", flush=True)
+
+    if role == "reviewer":
+        # Le code courant vient de l'index, pas de la commande du manager
+        code = get_latest_content(req_id, "code") or content
+        # Après une première revue : diff depuis le code déjà revu + remarques ouvertes
+        context = review.build_context(req_id, code, content, system_prompt)
+    else:
+        smart = build_smart_context(req_id, role)
+        context = f"CTX:\n{smart}\nIN:\n{content}\nROLE:{system_prompt}"
+
+    stream_id = None
+    on_chunk = None
+    # Les tâches par fichier tournent en parallèle : leurs fragments se mélangeraient
+    if role in STREAM_ROLES and not data.get("file"):
+        stream_id = uuid.uuid4().hex
+        chunk_counter = itertools.count()
+
+        def emit_chunk(text):
+            publish_chunk(role, req_id, stream_id, next(chunk_counter), text)
+
+        on_chunk = emit_chunk
+
+    try:
+        response = get_ai_response(role, content, context, on_chunk=on_chunk)
+    except LLMError as e:
+        print(f"❌ [{role}] {e}", flush=True)
+        publish_failure(role, data, content, f"AI ERROR: {e}", stream_id)
+        return
+    if role == "reviewer":
+        review.save(req_id, code, response)
+    msg_type = "code" if role == "coder" else "data"
+    fields = None
+    if data.get("file"):
+        # Tâche d'un seul fichier : le manager joint les parties avant la revue
+        msg_type = "code_part"
+        fields = {"file": data["file"]}
+
+    publish_message(
+        role, response, msg_type, req_id, status="DONE", stream_id=stream_id, fields=fields
+    )
+    print(f"✅ [{role}] Sent.", flush=True)
+
+
+def process_entry(role, msg_id, data):
+    """handle_message instrumenté : attente en file (d'après l'ID) et durée de traitement."""
+    metrics.QUEUE_WAIT_SECONDS.observe(metrics.entry_age(msg_id), role=role)
+    with metrics.HANDLE_SECONDS.time(role=role):
+        handle_message(role, data)
+
+
+def claim_stale_entries(role, group, consumer, start_id):
+    """Récupère les entrées restées en attente chez un worker mort (XAUTOCLAIM)."""
+    inbox = inbox_key(role)
+    next_id, claimed, _deleted = r.xautoclaim(
+        inbox, group, consumer, min_idle_time=CLAIM_IDLE_MS, start_id=start_id, count=10
+    )
+    entries = []
+    for msg_id, data in claimed:
+        pending = r.xpending_range(inbox, group, min=msg_id, max=msg_id, count=1)
+        if pending and pending[0]["times_delivered"] > MAX_DELIVERIES:
+            print(f"☠️ [{role}] Dropping {msg_id} after {MAX_DELIVERIES} deliveries.", flush=True)
+            if data.get("request_id"):
+                # Comme un échec du modèle : le manager réessaie ou arrête le projet
+                error = f"AGENT ERROR: dropped after {MAX_DELIVERIES} deliveries"
+                publish_failure(role, data, get_message_content(data), error)
+            r.xack(inbox, group, msg_id)
+            continue
+        entries.append((msg_id, data))
+    return next_id, entries
+
+
+def run_agent(role, consumer=None):
+    group = get_group_name(role)
+    consumer = consumer or get_default_consumer()
+    inbox = inbox_key(role)
+    print(f"👤 AGENT {role.upper()} (SILENT MODE) [{inbox} {group}/{consumer}]", flush=True)
+    # Depuis le début de l'inbox : les commandes déposées avant le démarrage sont servies
+    ensure_group(inbox, group, start_id="0")
+    claim_cursor = "0-0"
+    last_claim = 0.0
 
     while True:
         try:
-            messages = r.xread({STREAM_KEY: last_id}, count=1, block=5000)
-            if messages:
-                stream, msgs = messages[0]
-                last_id = msgs[0][0]
-                data = msgs[0][1]
-
-                sender = data.get("sender", "")
-                content = data.get("content", "")
-                req_id = data.get("request_id")
-                status = data.get("status", "DONE")
-
-                if sender != role and my_tag in content and req_id and status == "DONE":
-                    print(f"⚡ [{role}] Processing...", flush=True)
-
-                    if role == "reviewer":
-                        context = f"CODE:\n{content}\nROLE:{system_prompt}"
-                    else:
-                        smart = build_smart_context(req_id)
-                        context = f"CTX:\n{smart}\nIN:\n{content}\nROLE:{system_prompt}"
-
-                    response = get_ai_response(role, content, context)
-                    msg_type = "code" if role == "coder" else "data"
-
-                    publish_message(role, response, msg_type, req_id, status="DONE")
-                    print(f"✅ [{role}] Sent.", flush=True)
+            entries = []
+            if time.time() - last_claim >= CLAIM_INTERVAL:
+                claim_cursor, entries = claim_stale_entries(role, group, consumer, claim_cursor)
+                last_claim = time.time()
+            if not entries:
+                messages = r.xreadgroup(group, consumer, {inbox: ">"}, count=1, block=5000)
+                if messages:
+                    entries = messages[0][1]
+
+            for msg_id, data in entries:
+                process_entry(role, msg_id, data)
+                # ACK après traitement : un crash avant ici laisse l'entrée en attente
+                r.xack(inbox, group, msg_id)
         except Exception as e:
+            metrics.HANDLE_ERRORS.inc(role=role)
             print(f"Err {role}: {e}", flush=True)
             time.sleep(1)
 
@@ -73,5 +199,8 @@ def run_agent(role):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--role", required=True)
+    parser.add_argument("--consumer", help="Consumer name in the role's group (default: host-pid)")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics (default: METRICS_PORT)")
     args = parser.parse_args()
-    run_agent(args.role)
+    metrics.start_metrics_server(args.metrics_port)
+    run_agent(args.role, args.consumer)
@@ -1,55 +1,111 @@
 import json
 import os
-import re
 import time
 import uuid
+from collections import Counter
 
-from utils import STREAM_KEY, build_smart_context, get_ai_response, publish_message, r
+import artifacts
+import budget
+import fanout
+import metrics
+from llm_client import LLMError
+from utils import (
+    AGENT_ROLES,
+    STREAM_KEY,
+    build_smart_context,
+    expire_project,
+    get_ai_response,
+    get_latest_content,
+    get_message_content,
+    publish_message,
+    publish_messages,
+    r,
+)
+from worker_pool import KeyedWorkerPool
+
+# Transitions fixes : rôle qui vient de livrer -> (cible, instruction)
+PIPELINE_RULES = {
+    "analyst": ("@Architect", "Design the file tree and stack from the specs."),
+    "architect": ("@Coder", "Write the full code following the plan."),
+    "coder": ("@Reviewer", "Audit the latest code."),
+}
+# Décisions de routage par chemin : "rule", "llm", "fallback"
+ROUTING_STATS = Counter()
+ROUTING_STATS_KEY = "manager:routing_stats"
+# Étapes finales posées quand le budget d'un projet est dépassé : plus aucun routage
+STOPPED_STAGES = ("STOPPED", "ESCALATED")
+# Taille du pool de dispatch et profondeur de file exposée dans Redis
+MANAGER_WORKERS = int(os.getenv("MANAGER_WORKERS", "8"))
+POOL_STATS_KEY = "manager:pool"
 
 
 def get_last_coder_content(request_id):
-    """Retrieve the last coder message content from the stream for a given request."""
-    if not request_id:
-        return ""
-    messages = r.xrevrange(STREAM_KEY, count=100)
-    for msg_id, data in messages:
-        if data.get("request_id") == request_id and data.get("sender") == "coder":
-            return data.get("content", "")
-    return ""
-
-
-def save_artifacts(content, request_id):
-    pattern = r"```python(.*?)```"
-    matches = re.findall(pattern, content, re.DOTALL)
-    saved_files = []
-    if matches:
-        if not os.path.exists("livrables"):
-            os.makedirs("livrables")
-        for idx, code in enumerate(matches):
-            filename = f"livrables/projet_{request_id[:8]}_script_{idx+1}.py"
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(code.strip())
-            saved_files.append(filename)
-    return saved_files
+    """Retrieve the latest code delivered for a request (one index lookup)."""
+    return get_latest_content(request_id, "code")
 
 
-def decide_next_step(sender, content, request_id):
+def save_artifacts(request_id):
+    """Écrit le dernier code livré (fichiers modifiés seulement). Renvoie le manifeste."""
+    manifest, changed = artifacts.save(request_id, get_last_coder_content(request_id))
+    if changed:
+        print(f"💾 {len(changed)} file(s) written for {request_id}", flush=True)
+    return manifest
+
+
+def target_role(target):
+    """Rôle dont l'inbox reçoit la commande ("@Coder" -> "coder"), None si inconnu."""
+    role = target.lstrip("@").strip().lower()
+    return role if role in AGENT_ROLES else None
+
+
+def get_stage(request_id):
+    """Dernière cible routée pour ce projet (ex. "@Coder"), None si inconnue."""
+    return r.get(f"project:{request_id}:stage")
+
+
+def set_stage(request_id, target):
+    r.set(f"project:{request_id}:stage", target)
+
+
+def count_decision(path):
+    ROUTING_STATS[path] += 1
+    metrics.ROUTING_DECISIONS.inc(path=path)
+    r.hincrby(ROUTING_STATS_KEY, path, 1)
+
+
+def route_by_rules(sender, content, stage):
+    """Transitions évidentes du pipeline, sans appel modèle. None si le cas est ambigu."""
     if sender == "reviewer" and "VALIDATED" in content:
         return "FINISH", "OK"
+    if sender == "user":
+        return "@Analyst", f"EXECUTE: {content}"
+    # On ne suit la règle que si c'est bien le rôle attendu qui répond
+    if stage != f"@{sender.capitalize()}":
+        return None
+    if sender == "reviewer":
+        return "@Coder", f"Apply the reviewer's fixes:\n{content}"
+    return PIPELINE_RULES.get(sender)
 
-    smart_context = build_smart_context(request_id)
+
+def decide_next_step(sender, content, request_id):
+    decision = route_by_rules(sender, content, get_stage(request_id))
+    if decision is not None:
+        count_decision("rule")
+        return decision
+
+    smart_context = build_smart_context(request_id, "manager")
 
     system_prompt = """
     ROLE: Workflow Logic Router.
     GOAL: Move ticket to next stage.
-    STATES: 
+    STATES:
     1. User Input -> @Analyst (Get Specs)
     2. Specs -> @Architect (Get Plan)
     3. Plan -> @Coder (Get Code)
     4. Code -> @Reviewer (Audit)
     5. Review Fail -> @Coder (Fix)
     6. Review Pass -> FINISH
-    
+
     OUTPUT: JSON {"target": "@Role", "instruction": "Direct Command"}
     """
 
@@ -59,62 +115,225 @@ def decide_next_step(sender, content, request_id):
     NEXT STEP?
     """
 
+    # Compté avant l'appel : une réponse illisible ou un échec consomme aussi le budget
+    budget.add_model_call(request_id)
     try:
         response = get_ai_response("manager", user_prompt, system_prompt)
         clean_json = response.replace("```json", "").replace("```", "").strip()
         decision = json.loads(clean_json)
+        count_decision("llm")
         return decision["target"], decision["instruction"]
     except (json.JSONDecodeError, KeyError, TypeError) as e:
         print(f"Decision parsing error: {e}", flush=True)
+        count_decision("fallback")
         return "@Analyst", "Analyze status."
 
 
-def run_manager():
-    print("🤖 MANAGER (MODE INDUSTRIEL)", flush=True)
+def stop_project(request_id, reason):
+    """Budget dépassé (ou échecs répétés) : fin avec les livrables courants, ou pause."""
+    print(f"⛔ Budget exceeded for {request_id}: {reason}", flush=True)
+    metrics.BUDGET_STOPS.inc(action=budget.BUDGET_ACTION)
+    budget.finish(request_id)
+    if budget.BUDGET_ACTION == "escalate":
+        set_stage(request_id, "ESCALATED")
+        publish_message(
+            "manager",
+            f"ESCALATION: {reason}. Project paused for human review.",
+            "escalation",
+            request_id,
+            status="DONE",
+        )
+        # Pas de reprise : les clés restent lisibles PROJECT_TTL secondes, puis expirent
+        expire_project(request_id)
+        return
+    set_stage(request_id, "STOPPED")
+    manifest = save_artifacts(request_id)
+    publish_message(
+        "manager",
+        f"STOPPED: {reason}. Files: {len(manifest['files'])}",
+        "end",
+        request_id,
+        status="DONE",
+        fields={"manifest_version": manifest["version"]},
+    )
+
+
+def check_error_budget(request_id, source, error):
+    """Compte un échec de modèle ; renvoie False (projet arrêté) au-delà des reprises."""
+    reason = budget.exceeded(budget.record_error(request_id))
+    if reason:
+        stop_project(request_id, f"{reason}, last from {source}: {error}")
+        return False
+    print(f"🔁 Retrying {source} for {request_id}", flush=True)
+    return True
+
+
+def handle_error(data, content):
+    """Échec d'un agent : la même commande lui est renvoyée, dans la limite du budget."""
+    req_id = data["request_id"]
+    role = data.get("sender", "")
+    if get_stage(req_id) in STOPPED_STAGES or role not in AGENT_ROLES:
+        return
+    if not check_error_budget(req_id, role, content):
+        return
+    task = data.get("task") or f"@{role.capitalize()} Retry your last task."
+    fields = {"file": data["file"]} if data.get("file") else None
+    publish_message("manager", task, "cmd", req_id, status="DONE", inbox=role, fields=fields)
+
+
+def route(sender, content, request_id):
+    """decide_next_step avec reprises ; None si le projet a été arrêté."""
+    while True:
+        try:
+            return decide_next_step(sender, content, request_id)
+        except LLMError as e:
+            print(f"❌ Routing failed for {request_id}: {e}", flush=True)
+            publish_message("manager", f"AI ERROR: {e}", "error", request_id, status="ERROR")
+            if not check_error_budget(request_id, "manager", e):
+                return None
+
+
+def handle_message(data):
+    """Traite une entrée du flux de contrôle : nouvel ordre ou étape de projet."""
+    sender = data.get("sender", "")
+    req_id = data.get("request_id")
+    status = data.get("status", "DONE")
+
+    if sender == "manager":
+        return
+    if req_id and data.get("type") == "error":
+        handle_error(data, get_message_content(data))
+        return
+    if status != "DONE":
+        return
+    content = get_message_content(data)
+
+    if sender == "user" and not req_id:
+        new_guid = str(uuid.uuid4())
+        print(f"✨ NEW JOB: {new_guid}", flush=True)
+        target, instruction = route_by_rules(sender, content, None)
+        count_decision("rule")
+        set_stage(new_guid, target)
+        budget.start(new_guid)
+        publish_message(
+            "manager",
+            f"{target} {instruction}",
+            "cmd",
+            request_id=new_guid,
+            status="DONE",
+            inbox=target_role(target),
+        )
+
+    elif req_id:
+        if get_stage(req_id) in STOPPED_STAGES:
+            return
+        is_part = data.get("type") == "code_part"
+        state = budget.record_output(
+            req_id,
+            sender,
+            content,
+            rounds=0 if is_part else 1,
+            model_calls=0 if data.get("fanout") else 1,
+            tokens=not data.get("fanout"),
+        )
+        reason = budget.exceeded(state)
+        if reason:
+            stop_project(req_id, reason)
+            return
+        if is_part:
+            merged = fanout.add_part(req_id, data.get("file", ""), content)
+            if merged is not None:
+                print(f"🧩 All files received for {req_id}", flush=True)
+                publish_message("coder", merged, "code", req_id, fields={"fanout": "joined"})
+            return
+        decision = route(sender, content, req_id)
+        if decision is None:
+            return
+        target, instruction = decision
+
+        if target == "FINISH":
+            budget.finish(req_id)
+            manifest = save_artifacts(req_id)
+            publish_message(
+                "manager",
+                f"DONE. Files: {len(manifest['files'])}",
+                "end",
+                req_id,
+                status="DONE",
+                fields={"manifest_version": manifest["version"]},
+            )
+        else:
+            print(f"👉 {target}", flush=True)
+            set_stage(req_id, target)
+            tasks = (
+                fanout.plan_tasks(req_id, content)
+                if sender == "architect" and target == "@Coder"
+                else None
+            )
+            if tasks:
+                # Un fichier par tâche : les codeurs disponibles les écrivent en parallèle
+                print(f"🧩 Fan-out: {len(tasks)} files", flush=True)
+                publish_messages(tasks)
+                return
+            # Le tag reste dans la commande pour le terminal et le prompt de l'agent
+            if target not in instruction:
+                instruction = f"{target} {instruction}"
+            publish_message(
+                "manager", instruction, "cmd", req_id, status="DONE", inbox=target_role(target)
+            )
+
+
+def process_entry(msg_id, data):
+    """handle_message instrumenté : attente en file (d'après l'ID) et durée de traitement."""
+    metrics.QUEUE_WAIT_SECONDS.observe(metrics.entry_age(msg_id), role="manager")
+    with metrics.HANDLE_SECONDS.time(role="manager"):
+        handle_message(data)
+
+
+def check_deadline(request_id):
+    """Balayage : arrête un projet bloqué dont l'échéance est passée sans nouveau message."""
+    state = budget.get_state(request_id)
+    if not state or get_stage(request_id) in STOPPED_STAGES:
+        budget.finish(request_id)
+        return
+    reason = budget.exceeded(state)
+    if reason:
+        stop_project(request_id, reason)
+
+
+def run_manager(workers=None):
+    workers = workers or MANAGER_WORKERS
+    print(f"🤖 MANAGER (MODE INDUSTRIEL) x{workers}", flush=True)
+    # Un projet = une clé : ordre strict par request_id, projets différents en parallèle
+    pool = KeyedWorkerPool(workers, name="manager")
     last_id = "$"
+    last_sweep = 0.0
 
     while True:
         try:
-            messages = r.xread({STREAM_KEY: last_id}, count=1, block=5000)
+            if time.time() - last_sweep >= budget.SWEEP_INTERVAL:
+                # Dans le pool, derrière les messages déjà reçus du même projet
+                for request_id in budget.overdue():
+                    pool.submit(request_id, check_deadline, request_id)
+                last_sweep = time.time()
+            depth = pool.queue_depth()
+            metrics.QUEUE_DEPTH.set(depth, role="manager")
+            r.hset(POOL_STATS_KEY, mapping={"queue_depth": depth, "workers": workers})
+            if depth >= workers * 4:
+                # Back-pressure : on laisse les workers rattraper avant de lire la suite
+                time.sleep(0.05)
+                continue
+            messages = r.xread({STREAM_KEY: last_id}, count=10, block=5000)
             if messages:
-                stream, msgs = messages[0]
-                last_id = msgs[0][0]
-                data = msgs[0][1]
-
-                sender = data.get("sender", "")
-                req_id = data.get("request_id")
-                status = data.get("status", "DONE")
-
-                if status != "DONE":
-                    continue
-
-                if sender == "user" and not req_id:
-                    new_guid = str(uuid.uuid4())
-                    print(f"✨ NEW JOB: {new_guid}", flush=True)
-                    publish_message(
-                        "manager",
-                        f"EXECUTE: {data['content']}",
-                        "cmd",
-                        request_id=new_guid,
-                        status="DONE",
-                    )
-
-                elif req_id and sender != "manager":
-                    target, instruction = decide_next_step(sender, data["content"], req_id)
-
-                    if target == "FINISH":
-                        coder_content = get_last_coder_content(req_id)
-                        files = save_artifacts(coder_content, req_id)
-                        publish_message(
-                            "manager", f"DONE. Files: {len(files)}", "end", req_id, status="DONE"
-                        )
-                    else:
-                        print(f"👉 {target}", flush=True)
-                        publish_message("manager", instruction, "cmd", req_id, status="DONE")
+                for msg_id, data in messages[0][1]:
+                    last_id = msg_id
+                    pool.submit(data.get("request_id") or msg_id, process_entry, msg_id, data)
         except Exception as e:
+            metrics.HANDLE_ERRORS.inc(role="manager")
             print(f"Err: {e}", flush=True)
             time.sleep(1)
 
 
 if __name__ == "__main__":
+    metrics.start_metrics_server()
     run_manager()
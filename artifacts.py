@@ -0,0 +1,122 @@
+"""Écriture des livrables d'un projet, pilotée par un manifeste.
+
+Les fichiers sont tirés des blocs de code du codeur : le chemin vient de l'en-tête
+`# Nom du fichier: <path>` (les blocs python sans nom deviennent script_{n}.py). Chaque
+projet a son dossier ARTIFACTS_DIR/{request_id}/ et un .manifest.json (sha256, taille et
+version de dernière modification par fichier). Seuls les fichiers dont le hash a changé sont
+réécrits, via un fichier temporaire renommé : un lecteur ne voit jamais un fichier à moitié
+écrit. Un consommateur qui connaît la version N ne synchronise que changed_since(manifest, N).
+"""
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import tempfile
+import time
+
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", "livrables")
+MANIFEST_NAME = ".manifest.json"
+
+CODE_BLOCK = re.compile(r"```([\w+-]*)[^\n]*\n(.*?)```", re.S)
+FILE_HEADER = re.compile(
+    r"^\s*(?:#|//|--)\s*(?:Nom du fichier|File(?:name)?)\s*:\s*`?([^\s`]+)`?\s*$", re.I
+)
+
+
+def project_dir(request_id):
+    return os.path.join(ARTIFACTS_DIR, request_id)
+
+
+def safe_path(path):
+    """Chemin relatif normalisé, ou None s'il sortirait du dossier du projet."""
+    path = posixpath.normpath(path.strip().replace("\\", "/"))
+    if path.startswith(("/", "../")) or path in (".", "..", MANIFEST_NAME):
+        return None
+    return path
+
+
+def parse_files(content):
+    """{chemin: contenu} des blocs de code ; le dernier bloc d'un même chemin l'emporte."""
+    files = {}
+    unnamed = 0
+    for match in CODE_BLOCK.finditer(content or ""):
+        lang, body = match.group(1).lower(), match.group(2)
+        first, _, rest = body.partition("\n")
+        header = FILE_HEADER.match(first)
+        path = safe_path(header.group(1)) if header else None
+        if header:
+            body = rest
+        if path is None:
+            if lang != "python" and not header:
+                continue
+            unnamed += 1
+            path = f"script_{unnamed}.py"
+        files[path] = body.strip("\n") + "\n"
+    return files
+
+
+def sha256(data):
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path, data):
+    """Écrit dans un fichier temporaire du même dossier puis le renomme sur la cible."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        # mkstemp crée en 0600 : droits usuels d'un livrable
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_manifest(request_id):
+    """Manifeste du projet : {"request_id", "version", "updated_at", "files": {...}}."""
+    try:
+        with open(os.path.join(project_dir(request_id), MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"request_id": request_id, "version": 0, "updated_at": None, "files": {}}
+
+
+def changed_since(manifest, version):
+    """Chemins modifiés après la version `version` du manifeste."""
+    return sorted(path for path, e in manifest["files"].items() if e["version"] > version)
+
+
+def save(request_id, content):
+    """Écrit les fichiers nouveaux ou modifiés. Renvoie (manifeste, chemins réécrits).
+
+    Les fichiers absents de cette livraison sont gardés : un correctif peut ne livrer qu'un
+    fichier.
+    """
+    manifest = load_manifest(request_id)
+    version = manifest["version"] + 1
+    changed = []
+    for path, data in parse_files(content).items():
+        digest = sha256(data)
+        entry = manifest["files"].get(path)
+        target = os.path.join(project_dir(request_id), path)
+        if entry and entry["sha256"] == digest and os.path.exists(target):
+            continue
+        write_atomic(target, data)
+        manifest["files"][path] = {
+            "sha256": digest,
+            "size": len(data.encode("utf-8")),
+            "version": version,
+        }
+        changed.append(path)
+    if changed:
+        manifest.update({"version": version, "updated_at": time.time()})
+        write_atomic(
+            os.path.join(project_dir(request_id), MANIFEST_NAME),
+            json.dumps(manifest, indent=2, sort_keys=True),
+        )
+    return manifest, changed
@@ -0,0 +1,138 @@
+"""Runtime asyncio : un processus par rôle garde plusieurs projets en vol.
+
+Les entrées sont consommées avec redis.asyncio et dispatchées par request_id :
+les projets différents avancent en parallèle (dans la limite de --concurrency),
+les messages d'un même projet sont traités strictement dans l'ordre d'arrivée.
+--role manager lance agent_manager.run_manager, qui a déjà ce dispatch par projet.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis.asyncio as aioredis
+
+import agent_generic
+import agent_manager
+import metrics
+from utils import ensure_group, inbox_key
+
+DEFAULT_CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", "8"))
+
+
+class OrderedDispatcher:
+    """Exécute des jobs en parallèle entre clés et en série pour une même clé."""
+
+    def __init__(self, concurrency):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tails = {}
+        self.pending = 0
+
+    def submit(self, key, job):
+        """Planifie job (coroutine function) derrière le dernier job de la même clé."""
+        previous = self.tails.get(key)
+        task = asyncio.ensure_future(self._run(key, previous, job))
+        self.tails[key] = task
+        self.pending += 1
+        return task
+
+    async def _run(self, key, previous, job):
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            async with self.semaphore:
+                await job()
+        except Exception as e:
+            print(f"Err [{key}]: {e}", flush=True)
+        finally:
+            self.pending -= 1
+            if self.tails.get(key) is asyncio.current_task():
+                del self.tails[key]
+
+    async def wait_for_capacity(self, limit):
+        """Back-pressure : ne lit plus le flux tant que trop de jobs sont en attente."""
+        while self.pending >= limit:
+            await asyncio.sleep(0.05)
+
+
+def get_async_redis():
+    return aioredis.Redis(
+        host=os.getenv("REDIS_HOST"),
+        port=int(os.getenv("REDIS_PORT")),
+        db=int(os.getenv("REDIS_DB", "0")),
+        decode_responses=True,
+    )
+
+
+async def run_agent_async(role, concurrency, consumer=None):
+    """Équivalent asyncio de agent_generic.run_agent (même consumer group)."""
+    group = agent_generic.get_group_name(role)
+    consumer = consumer or agent_generic.get_default_consumer()
+    print(f"👤 AGENT {role.upper()} (ASYNC x{concurrency}) [{group}/{consumer}]", flush=True)
+
+    ar = get_async_redis()
+    loop = asyncio.get_running_loop()
+    # Les handlers (contexte, appel modèle, publication) tournent dans un pool borné
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    dispatcher = OrderedDispatcher(concurrency)
+    inbox = inbox_key(role)
+    await loop.run_in_executor(executor, ensure_group, inbox, group, "0")
+
+    def make_job(msg_id, data):
+        async def job():
+            await loop.run_in_executor(executor, agent_generic.process_entry, role, msg_id, data)
+            await ar.xack(inbox, group, msg_id)
+
+        return job
+
+    claim_cursor = "0-0"
+    last_claim = 0.0
+    while True:
+        try:
+            await dispatcher.wait_for_capacity(concurrency * 2)
+            metrics.QUEUE_DEPTH.set(dispatcher.pending, role=role)
+            entries = []
+            if time.time() - last_claim >= agent_generic.CLAIM_INTERVAL:
+                claim_cursor, entries = await loop.run_in_executor(
+                    executor,
+                    agent_generic.claim_stale_entries,
+                    role,
+                    group,
+                    consumer,
+                    claim_cursor,
+                )
+                last_claim = time.time()
+            if not entries:
+                messages = await ar.xreadgroup(
+                    group, consumer, {inbox: ">"}, count=concurrency, block=5000
+                )
+                if messages:
+                    entries = messages[0][1]
+
+            for msg_id, data in entries:
+                # Les tâches par fichier d'un même projet avancent en parallèle
+                key = data.get("request_id") or msg_id
+                if data.get("file"):
+                    key = f"{key}:{data['file']}"
+                dispatcher.submit(key, make_job(msg_id, data))
+        except Exception as e:
+            metrics.HANDLE_ERRORS.inc(role=role)
+            print(f"Err {role}: {e}", flush=True)
+            await asyncio.sleep(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--role", required=True, help="manager, analyst, architect, coder, ...")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--consumer", help="Consumer name in the role's group (default: host-pid)")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics (default: METRICS_PORT)")
+    args = parser.parse_args()
+    metrics.start_metrics_server(args.metrics_port)
+    if args.role == "manager":
+        # Un seul dispatcher pour le manager : le pool à clés de agent_manager (stats incluses)
+        agent_manager.run_manager(args.concurrency)
+    else:
+        asyncio.run(run_agent_async(args.role, args.concurrency, args.consumer))
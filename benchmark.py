@@ -0,0 +1,258 @@
+"""Benchmark de bout en bout : vrais processus manager/agents, backend modèle simulé.
+
+Pour chaque niveau de concurrence, la base Redis dédiée (--redis-db) est vidée, le manager
+et les agents sont lancés avec LLM_PROVIDER=fake, N ordres sont publiés d'un coup et l'on
+attend N messages "end". Les résultats sont ajoutés à un fichier JSONL avec le commit
+courant pour comparer les versions entre elles.
+
+Usage :
+    python3 benchmark.py --levels 1 10 100 --latency-scale 0.05
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import redis
+
+from log_analyzer import percentile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+AGENT_ROLES = ("analyst", "architect", "coder", "reviewer")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_factory(env, workdir, workers):
+    """Lance le manager et les agents (workers[role] processus par rôle)."""
+    procs = []
+    log = open(os.path.join(workdir, "factory.log"), "a")
+
+    def spawn(*args):
+        procs.append(
+            subprocess.Popen([sys.executable, *args], cwd=workdir, env=env, stdout=log, stderr=log)
+        )
+
+    spawn(os.path.join(ROOT, "agent_manager.py"))
+    spawn(os.path.join(ROOT, "summarizer.py"))
+    for role in AGENT_ROLES:
+        for i in range(workers.get(role, 1)):
+            spawn(
+                os.path.join(ROOT, "agent_generic.py"), "--role", role, "--consumer", f"{role}-{i}"
+            )
+    return procs
+
+
+def stop_factory(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def load_orders(paths):
+    """Ordres utilisateur des journaux projet (premier message de type "order")."""
+    from log_analyzer import expand_paths, iter_entries
+
+    orders = []
+    for path in expand_paths(paths):
+        for entry in iter_entries(path):
+            if entry.get("type") == "order" and entry.get("content"):
+                orders.append(entry["content"])
+                break
+    return orders
+
+
+def run_scenario(client, env, concurrency, workers, timeout, stream_key, orders=None):
+    """Publie `concurrency` ordres et mesure jusqu'au dernier message "end".
+
+    Sans `orders`, des ordres synthétiques ; sinon ils sont repris cycliquement.
+    """
+    client.flushdb()
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    procs = start_factory(env, workdir, workers)
+    try:
+        # Laisse le temps aux processus de créer leurs consumer groups avant les ordres
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            if client.exists(stream_key) and all(
+                client.exists(f"inbox:{role}") for role in AGENT_ROLES
+            ):
+                break
+            time.sleep(0.2)
+        time.sleep(1)
+
+        pipe = client.pipeline(transaction=False)
+        for i in range(concurrency):
+            pipe.xadd(
+                stream_key,
+                {
+                    "request_id": "",
+                    "sequence_id": 0,
+                    "sender": "user",
+                    "content": (
+                        orders[i % len(orders)] if orders else f"bench-{i}: build a small CLI tool"
+                    ),
+                    "type": "order",
+                    "status": "DONE",
+                },
+            )
+        order_ids = pipe.execute()
+        start = int(order_ids[0].split("-")[0]) / 1000
+
+        finished = {}
+        messages = 0
+        last_id = order_ids[-1]
+        deadline = time.time() + timeout
+        while len(finished) < concurrency and time.time() < deadline:
+            batch = client.xread({stream_key: last_id}, count=500, block=1000)
+            if not batch:
+                continue
+            for entry_id, data in batch[0][1]:
+                last_id = entry_id
+                req_id = data.get("request_id")
+                if not req_id or data.get("status") != "DONE":
+                    continue
+                messages += 1
+                if data.get("type") == "end":
+                    finished[req_id] = int(entry_id.split("-")[0]) / 1000
+        end = max(finished.values()) if finished else time.time()
+        try:
+            memory = client.info("memory")
+        except redis.ResponseError:  # INFO désactivé (Redis managé)
+            memory = {}
+        routing = client.hgetall("manager:routing_stats")
+    finally:
+        stop_factory(procs)
+
+    # Tous les ordres partent dans le même pipeline : même instant de départ
+    latencies = sorted(ts - start for ts in finished.values())
+    wall = max(end - start, 1e-6)
+    return {
+        "concurrency": concurrency,
+        "completed": len(finished),
+        "wall_seconds": round(wall, 3),
+        "projects_per_minute": round(len(finished) / wall * 60, 2),
+        "messages_per_second": round(messages / wall, 2),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "redis_used_memory": memory.get("used_memory"),
+        "redis_peak_memory": memory.get("used_memory_peak"),
+        "routing": {path: int(count) for path, count in routing.items()},
+    }
+
+
+def previous_result(path, concurrency, label):
+    if not os.path.exists(path):
+        return None
+    found = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get("concurrency") == concurrency and result.get("label") == label:
+                found = result
+    return found
+
+
+def provider_spec(args):
+    """LLM_PROVIDER des processus lancés ; chemins de cassette rendus absolus (cwd temporaire)."""
+    if not args.provider:
+        return f"fake:{os.path.abspath(args.fake_config)}" if args.fake_config else "fake"
+    name, _, arg = args.provider.partition(":")
+    if name in ("record", "replay") and arg:
+        timed = arg.endswith(":timed")
+        path = os.path.abspath(arg[: -len(":timed")] if timed else arg)
+        return f"{name}:{path}" + (":timed" if timed else "")
+    return args.provider
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark (fake LLM)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--redis-db", type=int, default=15, help="Dedicated DB, flushed per run")
+    parser.add_argument("--fake-config", help="JSON latency/response script for fake_llm.py")
+    parser.add_argument(
+        "--provider", help="LLM_PROVIDER override, e.g. replay:cassette.jsonl:timed"
+    )
+    parser.add_argument("--orders", nargs="+", help="Replay the orders of these project logs")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--coders", type=int, default=2)
+    parser.add_argument("--reviewers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--label", default="default", help="Scenario name for comparisons")
+    parser.add_argument("--output", default="benchmark_results.jsonl")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update(
+        {
+            "REDIS_HOST": os.getenv("REDIS_HOST", "localhost"),
+            "REDIS_PORT": os.getenv("REDIS_PORT", "6380"),
+            "REDIS_DB": str(args.redis_db),
+            "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY") or "benchmark",
+            "MODEL_SMART": os.getenv("MODEL_SMART") or "fake-smart",
+            "MODEL_FAST": os.getenv("MODEL_FAST") or "fake-fast",
+            "LLM_PROVIDER": provider_spec(args),
+            "FAKE_LLM_LATENCY_SCALE": str(args.latency_scale),
+            "CACHE_TTL": "0",
+            "PYTHONUNBUFFERED": "1",
+        }
+    )
+    client = redis.Redis(
+        host=env["REDIS_HOST"], port=int(env["REDIS_PORT"]), db=args.redis_db, decode_responses=True
+    )
+    stream_key = "table_ronde_stream"
+    workers = {"coder": args.coders, "reviewer": args.reviewers}
+    commit = git_commit()
+    orders = load_orders(args.orders) if args.orders else None
+
+    print(
+        f"{'N':>5} {'done':>5} {'proj/min':>9} {'msg/s':>7} "
+        f"{'p50':>7} {'p95':>7} {'p99':>7} {'MB':>7}"
+    )
+    for level in args.levels:
+        result = run_scenario(client, env, level, workers, args.timeout, stream_key, orders)
+        result.update(
+            {
+                "label": args.label,
+                "commit": commit,
+                "timestamp": datetime.utcnow().isoformat(),
+                "latency_scale": args.latency_scale,
+                "workers": workers,
+            }
+        )
+        before = previous_result(args.output, level, args.label)
+        print(
+            f"{level:>5} {result['completed']:>5} {result['projects_per_minute']:>9.1f} "
+            f"{result['messages_per_second']:>7.1f} {result['latency_p50']:>7.2f} "
+            f"{result['latency_p95']:>7.2f} {result['latency_p99']:>7.2f} "
+            f"{(result['redis_used_memory'] or 0) / 1e6:>7.1f}"
+        )
+        if before:
+            delta = result["projects_per_minute"] - before["projects_per_minute"]
+            print(f"      vs {before['commit']}: {delta:+.1f} proj/min")
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
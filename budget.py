@@ -0,0 +1,136 @@
+"""Budget d'exécution par projet, appliqué par le manager.
+
+Chaque sortie d'agent reçue par le manager est comptée dans project:{id}:budget : tours par
+rôle, appels modèle, échecs, tokens de sortie (estimés) et date de début. Les sorties successives du
+codeur et du reviewer sont comparées (égalité, puis difflib) pour repérer une boucle qui ne
+progresse plus. Au-delà d'une limite, le projet est arrêté ou escaladé (BUDGET_ACTION).
+"""
+
+import difflib
+import os
+import time
+
+from context_budget import estimate_tokens
+from utils import r
+
+LIMITS = {
+    "rounds": int(os.getenv("BUDGET_MAX_ROUNDS", "6")),
+    "model_calls": int(os.getenv("BUDGET_MAX_MODEL_CALLS", "60")),
+    "tokens": int(os.getenv("BUDGET_MAX_TOKENS", "200000")),
+    "deadline": float(os.getenv("BUDGET_DEADLINE", "3600")),
+    "repeats": int(os.getenv("BUDGET_MAX_REPEATS", "2")),
+    "similarity": float(os.getenv("BUDGET_REPEAT_SIMILARITY", "0.95")),
+    "errors": int(os.getenv("BUDGET_MAX_ERRORS", "3")),
+}
+# "abort" : message end avec les livrables courants ; "escalate" : projet mis en pause
+BUDGET_ACTION = os.getenv("BUDGET_ACTION", "abort")
+# Échéance de chaque projet en cours (zset) : le manager les balaie toutes les
+# BUDGET_SWEEP_INTERVAL secondes, même sans nouveau message
+DEADLINES_KEY = "budget:deadlines"
+SWEEP_INTERVAL = float(os.getenv("BUDGET_SWEEP_INTERVAL", "60"))
+# Sorties comparées d'un tour à l'autre, tronquées pour borner le coût de difflib
+WATCHED_SENDERS = ("coder", "reviewer")
+SIMILARITY_CHARS = 4000
+
+
+def budget_key(request_id):
+    return f"project:{request_id}:budget"
+
+
+def is_repeat(previous, current, threshold):
+    """Vrai si current reprend previous à l'identique ou presque (ratio difflib)."""
+    if previous is None:
+        return False
+    if previous == current:
+        return True
+    matcher = difflib.SequenceMatcher(None, previous, current, autojunk=False)
+    return (
+        matcher.real_quick_ratio() >= threshold
+        and matcher.quick_ratio() >= threshold
+        and matcher.ratio() >= threshold
+    )
+
+
+def exceeded(state, limits=None, now=None):
+    """Raison du dépassement, ou None. state : hash budget d'un projet."""
+    limits = limits or LIMITS
+    now = now or time.time()
+    for field, value in state.items():
+        if field.startswith("rounds:") and int(value) > limits["rounds"]:
+            return f"{field[7:]} ran {value} rounds (max {limits['rounds']})"
+        if field.startswith("repeats:") and int(value) >= limits["repeats"]:
+            return f"{field[8:]} repeated the same output {value} times"
+    if int(state.get("model_calls", 0)) > limits["model_calls"]:
+        return f"{state['model_calls']} model calls (max {limits['model_calls']})"
+    if int(state.get("errors", 0)) > limits["errors"]:
+        return f"{state['errors']} model failures (max {limits['errors']} retries)"
+    if int(state.get("tokens", 0)) > limits["tokens"]:
+        return f"~{state['tokens']} output tokens (max {limits['tokens']})"
+    started_at = float(state.get("started_at") or now)
+    if now - started_at > limits["deadline"]:
+        return f"running for {now - started_at:.0f}s (max {limits['deadline']:.0f}s)"
+    return None
+
+
+def start(request_id):
+    now = time.time()
+    with r.pipeline() as pipe:
+        pipe.hsetnx(budget_key(request_id), "started_at", now)
+        pipe.zadd(DEADLINES_KEY, {request_id: now + LIMITS["deadline"]}, nx=True)
+        pipe.execute()
+
+
+def finish(request_id):
+    """Projet terminé ou arrêté : il sort du balayage des échéances."""
+    r.zrem(DEADLINES_KEY, request_id)
+
+
+def overdue(now=None):
+    """Projets en cours dont l'échéance est passée (balayage périodique du manager)."""
+    return r.zrangebyscore(DEADLINES_KEY, "-inf", now or time.time())
+
+
+def get_state(request_id):
+    return {k: v for k, v in r.hgetall(budget_key(request_id)).items() if not k.startswith("last:")}
+
+
+def add_model_call(request_id):
+    """Appel modèle du manager lui-même (routage par LLM)."""
+    r.hincrby(budget_key(request_id), "model_calls", 1)
+
+
+def record_error(request_id):
+    """Compte un échec définitif d'appel modèle et renvoie l'état du budget."""
+    key = budget_key(request_id)
+    with r.pipeline() as pipe:
+        pipe.hsetnx(key, "started_at", time.time())
+        pipe.hincrby(key, "errors", 1)
+        pipe.execute()
+    return get_state(request_id)
+
+
+def record_output(request_id, sender, content, rounds=1, model_calls=1, tokens=True):
+    """Compte une sortie d'agent et renvoie l'état du budget (sans les textes comparés).
+
+    Une partie de fan-out compte un appel et ses tokens mais pas un tour (rounds=0) ; leur
+    jointure compte un tour, sans appel ni tokens déjà comptés (model_calls=0, tokens=False).
+    """
+    key = budget_key(request_id)
+    sample = content[:SIMILARITY_CHARS]
+    watched = rounds and sender in WATCHED_SENDERS
+    with r.pipeline() as pipe:
+        pipe.hget(key, f"last:{sender}")
+        pipe.hsetnx(key, "started_at", time.time())
+        pipe.hincrby(key, f"rounds:{sender}", rounds)
+        pipe.hincrby(key, "model_calls", model_calls)
+        pipe.hincrby(key, "tokens", estimate_tokens(content) if tokens else 0)
+        if watched:
+            pipe.hset(key, f"last:{sender}", sample)
+        previous = pipe.execute()[0]
+    if watched:
+        # Répétitions consécutives : une sortie différente remet le compteur à zéro
+        if is_repeat(previous, sample, LIMITS["similarity"]):
+            r.hincrby(key, f"repeats:{sender}", 1)
+        else:
+            r.hset(key, f"repeats:{sender}", 0)
+    return get_state(request_id)
@@ -0,0 +1,184 @@
+"""Enregistrement et rejeu des appels modèle (cassettes JSONL).
+
+LLM_PROVIDER=record:cassette.jsonl appelle Gemini et ajoute chaque échange à la cassette
+(hash du prompt, rôle, réponse, tokens, latence observée). LLM_PROVIDER=replay:cassette.jsonl
+ressert ces réponses sans réseau, instantanément, ou avec le timing enregistré
+(replay:cassette.jsonl:timed).
+
+Au rejeu, un prompt est d'abord cherché par hash ; s'il a changé (nouvelle version de
+l'orchestration), on sert la prochaine réponse non utilisée du même modèle et du même rôle.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from types import SimpleNamespace
+
+from fake_llm import detect_role
+
+
+class CassetteMiss(Exception):
+    """Aucune réponse enregistrée ne correspond au prompt."""
+
+
+def prompt_hash(model_name, prompt):
+    return hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def usage_counts(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0, 0
+    return (
+        getattr(usage, "prompt_token_count", 0) or 0,
+        getattr(usage, "candidates_token_count", 0) or 0,
+    )
+
+
+class RecordingModelFactory:
+    """Enveloppe une fabrique réelle et enregistre chaque appel réussi."""
+
+    def __init__(self, path, inner):
+        self.path = path
+        self.inner = inner
+        self.lock = threading.Lock()
+
+    def __call__(self, model_name):
+        return RecordingModel(self, self.inner(model_name), model_name)
+
+    def record(self, model_name, prompt, text, response, latency, first_chunk=None):
+        tokens_in, tokens_out = usage_counts(response)
+        entry = {
+            "hash": prompt_hash(model_name, prompt),
+            "model": model_name,
+            "role": detect_role(prompt),
+            "response": text,
+            "prompt_tokens": tokens_in,
+            "output_tokens": tokens_out,
+            "latency": round(latency, 4),
+            "first_chunk": round(first_chunk, 4) if first_chunk is not None else None,
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        # Une seule écriture en mode append : plusieurs processus peuvent partager la cassette
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class RecordingModel:
+    def __init__(self, factory, model, model_name):
+        self.factory = factory
+        self.model = model
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False):
+        start = time.perf_counter()
+        if not stream:
+            response = self.model.generate_content(prompt)
+            text = response.text
+            self.factory.record(
+                self.model_name, prompt, text, response, time.perf_counter() - start
+            )
+            return response
+        return self._stream(prompt, start)
+
+    def _stream(self, prompt, start):
+        parts = []
+        first_chunk = None
+        response = None
+        for response in self.model.generate_content(prompt, stream=True):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            parts.append(response.text or "")
+            yield response
+        self.factory.record(
+            self.model_name,
+            prompt,
+            "".join(parts),
+            response,
+            time.perf_counter() - start,
+            first_chunk,
+        )
+
+
+class ReplayModelFactory:
+    """Ressert une cassette : par hash de prompt, sinon dans l'ordre pour le même rôle."""
+
+    def __init__(self, path, timed=False):
+        self.timed = timed
+        self.lock = threading.Lock()
+        self.by_hash = defaultdict(deque)
+        self.by_role = defaultdict(deque)
+        self.last = {}
+        self.stats = Counter()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entry["used"] = False
+                self.by_hash[entry["hash"]].append(entry)
+                self.by_role[(entry["model"], entry["role"])].append(entry)
+
+    def __call__(self, model_name):
+        return ReplayModel(self, model_name)
+
+    @staticmethod
+    def _next_unused(entries):
+        while entries:
+            entry = entries.popleft()
+            if not entry["used"]:
+                return entry
+        return None
+
+    def lookup(self, model_name, prompt):
+        key = prompt_hash(model_name, prompt)
+        with self.lock:
+            entry = self._next_unused(self.by_hash.get(key, deque()))
+            if entry is not None:
+                self.stats["hit"] += 1
+            elif key in self.last:
+                # Prompt rejoué plus souvent qu'enregistré : même réponse
+                entry = self.last[key]
+                self.stats["repeat"] += 1
+            else:
+                role = detect_role(prompt)
+                entry = self._next_unused(self.by_role.get((model_name, role), deque()))
+                if entry is None:
+                    self.stats["miss"] += 1
+                    raise CassetteMiss(f"no recording for {model_name}/{role} ({key[:12]})")
+                self.stats["fallback"] += 1
+            entry["used"] = True
+            self.last[key] = entry
+            return entry
+
+
+class ReplayModel:
+    def __init__(self, factory, model_name):
+        self.factory = factory
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False):
+        entry = self.factory.lookup(self.model_name, prompt)
+        usage = SimpleNamespace(
+            prompt_token_count=entry["prompt_tokens"],
+            candidates_token_count=entry["output_tokens"],
+        )
+        latency = entry["latency"] if self.factory.timed else 0.0
+        if not stream:
+            time.sleep(latency)
+            return SimpleNamespace(text=entry["response"], usage_metadata=usage)
+        return self._stream(entry, latency, usage)
+
+    def _stream(self, entry, latency, usage, chunk_size=80):
+        text = entry["response"]
+        chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+        first_chunk = min(entry.get("first_chunk") or 0.0, latency)
+        time.sleep(first_chunk)
+        for idx, chunk in enumerate(chunks):
+            if idx:
+                time.sleep((latency - first_chunk) / max(1, len(chunks) - 1))
+            last = idx == len(chunks) - 1
+            yield SimpleNamespace(text=chunk, usage_metadata=usage if last else None)
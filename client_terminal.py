@@ -1,7 +1,7 @@
 import os
 import time
 
-from utils import STREAM_KEY, publish_message, r
+from utils import STREAM_KEY, get_message_content, publish_message, r
 
 C_MGR, C_USR = "\033[94m", "\033[97m"
 C_ANL, C_ARC = "\033[96m", "\033[95m"
@@ -25,6 +25,7 @@ def get_color(sender):
 
 def listener(last_id="$"):
     print(f"\n{C_MGR}--- LIVE FEED ---{C_RST}\n")
+    streaming = set()  # stream_id des réponses en cours d'affichage
     try:
         while True:
             messages = r.xread({STREAM_KEY: last_id}, count=10, block=1000)
@@ -37,12 +38,34 @@ def listener(last_id="$"):
                         continue
 
                     color = get_color(sender)
-                    clean = data.get("content", "").replace("\n", "\n│  ")
+                    stream_id = data.get("stream_id")
+
+                    if data.get("status") == "STREAMING":
+                        # Fragment : on l'affiche tel quel à la suite des précédents
+                        if stream_id not in streaming:
+                            streaming.add(stream_id)
+                            print(f"{color}┌─ [{sender.upper()}]\n│  ", end="")
+                        chunk = data.get("content", "").replace("\n", "\n│  ")
+                        print(f"{color}{chunk}{C_RST}", end="", flush=True)
+                        continue
+
+                    if stream_id in streaming:
+                        streaming.discard(stream_id)
+                        print(
+                            f"\n{color}└──────────────────────────────────────────────────{C_RST}"
+                        )
+                        # Le message final reprend le texte déjà affiché, sauf en cas d'erreur
+                        if data.get("status") == "DONE":
+                            continue
+
+                    content = get_message_content(data)
+                    clean = content.replace("\n", "\n│  ")
                     print(f"{color}┌─ [{sender.upper()}]")
                     print(f"│  {clean}")
                     print(f"└──────────────────────────────────────────────────{C_RST}")
 
-                    if "PROJET TERMINÉ" in data["content"] or "DONE. Files" in data["content"]:
+                    # Fin normale ou arrêt par le budget ("STOPPED: ...")
+                    if data.get("type") == "end":
                         print(f"\n{C_COD}✅ FINISHED.{C_RST}\n")
                         return
     except KeyboardInterrupt:
@@ -0,0 +1,115 @@
+"""Assemblage du contexte sous budget de tokens (fonctions pures).
+
+Les tokens sont estimés à ~4 caractères par token. La queue récente est prise du plus récent
+au plus ancien tant qu'elle tient dans le budget du rôle ; une entrée trop grosse voit ses
+blocs de code remplacés par une référence, et seule la plus récente peut être tronquée.
+Ce qui ne tient pas (le débordement) est laissé au résumeur.
+"""
+
+import os
+import re
+
+CHARS_PER_TOKEN = 4
+DEFAULT_BUDGET = 6000
+# En dessous de cette taille, un bloc de code n'est jamais élidé
+CODE_ELIDE_MIN_TOKENS = 200
+CODE_BLOCK = re.compile(r"```[^\n]*\n.*?```", re.S)
+FILE_NAME = re.compile(r"#\s*Nom du fichier\s*:\s*(\S+)")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def get_context_budget(role=None):
+    """Budget de contexte d'un rôle (CONTEXT_BUDGET_<ROLE> sinon CONTEXT_BUDGET)."""
+    default = os.getenv("CONTEXT_BUDGET", str(DEFAULT_BUDGET))
+    if role:
+        return int(os.getenv(f"CONTEXT_BUDGET_{role.upper()}", default))
+    return int(default)
+
+
+def tail_budget(budget, summary):
+    """Budget laissé à la queue une fois le résumé placé (au moins un quart du budget)."""
+    return max(budget - estimate_tokens(summary), budget // 4)
+
+
+def compression_budget(roles, summary):
+    """Budget de queue du rôle le plus contraint : au-delà, une entrée manque à un prompt."""
+    return min(tail_budget(get_context_budget(role), summary) for role in roles)
+
+
+def drop_replaced_parts(entries):
+    """Retire les fichiers de fan-out (code_part) antérieurs au dernier code joint."""
+    joined = max(
+        (i for i, (_, data) in enumerate(entries) if data.get("type") == "code"), default=-1
+    )
+    return [
+        entry
+        for i, entry in enumerate(entries)
+        if i > joined or entry[1].get("type") != "code_part"
+    ]
+
+
+def elide_code_blocks(text, ref):
+    """Remplace les gros blocs de code par une référence à l'entrée qui les contient."""
+
+    def replace(match):
+        block = match.group(0)
+        if estimate_tokens(block) < CODE_ELIDE_MIN_TOKENS:
+            return block
+        name = FILE_NAME.search(block)
+        label = name.group(1) if name else "code"
+        lines = block.count("\n") - 1
+        return f"[{label}: {lines} lines elided, see entry {ref}]"
+
+    return CODE_BLOCK.sub(replace, text)
+
+
+def truncate(text, max_tokens):
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - 16)
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "\n[... truncated]"
+
+
+def fit_tail(entries, budget, render):
+    """Sélectionne la queue qui tient dans `budget` tokens.
+
+    entries : [(entry_id, data)] dans l'ordre du flux ; render(data) -> texte.
+    Renvoie (débordement, lignes) : les entrées anciennes écartées, puis les textes retenus
+    dans l'ordre chronologique.
+    """
+    remaining = budget
+    lines = []
+    for idx in range(len(entries) - 1, -1, -1):
+        entry_id, data = entries[idx]
+        text = render(data)
+        if estimate_tokens(text) > remaining:
+            text = elide_code_blocks(text, entry_id)
+        if estimate_tokens(text) > remaining:
+            if lines:
+                return entries[: idx + 1], lines[::-1]
+            # L'entrée la plus récente est toujours présente, au besoin tronquée
+            text = truncate(text, remaining)
+        lines.append(text)
+        remaining -= estimate_tokens(text)
+    return [], lines[::-1]
+
+
+def split_for_compression(entries, budget, render):
+    """(à compresser, à garder) : rien tant que la queue tient dans le budget.
+
+    Au-delà, on ne garde que la moitié du budget en entrées récentes (au moins une) pour
+    ne pas relancer une compression à chaque nouveau message.
+    """
+    costs = [estimate_tokens(render(data)) for _, data in entries]
+    if sum(costs) <= budget:
+        return [], entries
+    target = budget // 2
+    kept = 0
+    split = len(entries)
+    while split > 0 and (split == len(entries) or kept + costs[split - 1] <= target):
+        split -= 1
+        kept += costs[split]
+    return entries[:split], entries[split:]
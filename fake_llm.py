@@ -0,0 +1,146 @@
+"""Backend modèle simulé (LLM_PROVIDER=fake[:config.json]) pour les benchmarks hors-ligne.
+
+Chaque rôle a une distribution de latence et une liste de réponses scriptées, servies
+cycliquement. Le rôle est déduit du prompt ("TASK FOR CODER: ..." ou la consigne de
+compression). Aucune clé API ni accès réseau n'est nécessaire.
+"""
+
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+DEFAULT_CONFIG = {
+    "seed": None,
+    "latency_scale": 1.0,
+    "latency": {
+        "default": {"dist": "lognormal", "median": 1.0, "sigma": 0.3},
+        "manager": {"dist": "lognormal", "median": 1.5, "sigma": 0.3},
+        "analyst": {"dist": "lognormal", "median": 3.0, "sigma": 0.4},
+        "architect": {"dist": "lognormal", "median": 3.0, "sigma": 0.4},
+        "coder": {"dist": "lognormal", "median": 8.0, "sigma": 0.5},
+        "reviewer": {"dist": "lognormal", "median": 2.0, "sigma": 0.4},
+        "summarizer": {"dist": "lognormal", "median": 1.0, "sigma": 0.3},
+    },
+    "responses": {
+        "manager": ['{"target": "@Coder", "instruction": "Continue with the plan."}'],
+        "analyst": [
+            "1. Goal: CLI tool.\n2. Tech Constraints: Python 3.11.\n3. Features: parse, run."
+        ],
+        "architect": ["```\nproject/\n├── main.py\n└── helpers.py\n```\nStack: Python 3.11"],
+        "coder": [
+            "```python\n# Nom du fichier: main.py\nfrom helpers import run\n\n"
+            "if __name__ == '__main__':\n    run()\n```\n"
+            "```python\n# Nom du fichier: helpers.py\ndef run():\n    print('ok')\n```"
+        ],
+        "reviewer": ["- Add error handling in run().", "VALIDATED"],
+        "summarizer": ["- Stack: Python 3.11\n- Files: main.py, helpers.py\n- Status: in progress"],
+    },
+}
+
+ROLE_PATTERN = re.compile(r"TASK FOR ([A-Z]+):")
+# Tâche d'un seul fichier (fan-out du manager)
+FILE_TASK = re.compile(r"Write ONLY the file `([^`]+)`")
+FILE_BLOCK = re.compile(r"```[^\n]*\n#\s*Nom du fichier\s*:\s*(\S+)\n.*?```", re.S)
+
+
+def load_config(path=None):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    path = path or os.getenv("FAKE_LLM_CONFIG")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            custom = json.load(f)
+        for key, value in custom.items():
+            if isinstance(value, dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+    if os.getenv("FAKE_LLM_LATENCY_SCALE"):
+        config["latency_scale"] = float(os.getenv("FAKE_LLM_LATENCY_SCALE"))
+    return config
+
+
+def select_file(text, prompt):
+    """Pour une tâche d'un seul fichier, ne renvoie que le bloc de ce fichier."""
+    # Seule la consigne courante compte, pas les commandes reprises dans le contexte
+    task = FILE_TASK.search(prompt.rsplit("TASK FOR", 1)[-1])
+    if not task:
+        return text
+    path = task.group(1)
+    for match in FILE_BLOCK.finditer(text):
+        if match.group(1) == path:
+            return match.group(0)
+    return f"```python\n# Nom du fichier: {path}\n# TODO\n```"
+
+
+def detect_role(prompt):
+    if "TASK: Compress logs" in prompt:
+        return "summarizer"
+    match = ROLE_PATTERN.search(prompt)
+    return match.group(1).lower() if match else "default"
+
+
+class FakeModelFactory:
+    """Remplace genai.GenerativeModel : FakeModelFactory(config)(model_name) -> FakeModel."""
+
+    def __init__(self, config_path=None):
+        self.config = load_config(config_path)
+        self.random = random.Random(self.config.get("seed"))
+        self.lock = threading.Lock()
+        self.scripts = {
+            role: itertools.cycle(responses)
+            for role, responses in self.config["responses"].items()
+            if responses
+        }
+
+    def __call__(self, model_name):
+        return FakeModel(self, model_name)
+
+    def sample_latency(self, role):
+        spec = self.config["latency"].get(role) or self.config["latency"]["default"]
+        with self.lock:
+            if spec["dist"] == "fixed":
+                value = spec["value"]
+            elif spec["dist"] == "uniform":
+                value = self.random.uniform(spec["low"], spec["high"])
+            else:
+                value = self.random.lognormvariate(0, spec["sigma"]) * spec["median"]
+        return value * self.config["latency_scale"]
+
+    def next_response(self, role):
+        with self.lock:
+            script = self.scripts.get(role) or self.scripts.get("default")
+            return next(script) if script else "OK"
+
+
+class FakeModel:
+    def __init__(self, factory, model_name):
+        self.factory = factory
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False):
+        role = detect_role(prompt)
+        text = select_file(self.factory.next_response(role), prompt)
+        latency = self.factory.sample_latency(role)
+        usage = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4
+        )
+        if not stream:
+            time.sleep(latency)
+            return SimpleNamespace(text=text, usage_metadata=usage)
+        return self._stream(text, latency, usage)
+
+    @staticmethod
+    def _stream(text, latency, usage, chunk_size=80):
+        chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+        # Premier fragment après ~20 % de la latence, le reste réparti uniformément
+        time.sleep(latency * 0.2)
+        for idx, chunk in enumerate(chunks):
+            if idx:
+                time.sleep(latency * 0.8 / max(1, len(chunks) - 1))
+            last = idx == len(chunks) - 1
+            yield SimpleNamespace(text=chunk, usage_metadata=usage if last else None)
@@ -0,0 +1,121 @@
+"""Découpage de l'étape code par fichier : une tâche par fichier du plan, puis jointure.
+
+Le manager lit l'arborescence produite par l'architecte, envoie une commande par fichier
+dans inbox:coder (champ `file`) et rassemble les réponses "code_part" dans
+project:{id}:fanout. Quand tous les fichiers sont arrivés, le code fusionné est publié comme
+une livraison normale du codeur (type "code"), avec un bloc `# Nom du fichier:` par fichier.
+"""
+
+import json
+import os
+import re
+
+from utils import r
+
+FANOUT_MIN_FILES = int(os.getenv("FANOUT_MIN_FILES", "2"))
+FANOUT_MAX_FILES = int(os.getenv("FANOUT_MAX_FILES", "12"))
+
+# Ligne d'arborescence : "│   ├── main.py", "└── src/", "|-- app.py", "`-- README.md"
+TREE_LINE = re.compile(
+    r"^(?P<indent>(?:[│|]\s{2,3}|\s{4})*)(?:[├└]──|[|`+]--)\s*(?P<name>[^\s#(]+)"
+)
+# Repli : chemins explicites cités dans le plan
+FILE_PATH = re.compile(
+    r"(?<![\w/.-])((?:[\w-]+/)*[\w-]+\.(?:py|txt|md|toml|cfg|ini|json|ya?ml|sh|js|ts|html|css))\b"
+)
+CODE_BLOCK = re.compile(r"```[^\n]*\n(.*?)```", re.S)
+FILE_HEADER = re.compile(r"^\s*#\s*Nom du fichier\s*:.*\n?")
+
+
+def fanout_key(request_id):
+    return f"project:{request_id}:fanout"
+
+
+def parse_plan_files(plan):
+    """Chemins des fichiers du plan, dans l'ordre, sans doublons."""
+    files = []
+    stack = []
+    for line in plan.splitlines():
+        match = TREE_LINE.match(line)
+        if not match:
+            continue
+        depth = len(match.group("indent")) // 4
+        name = match.group("name").strip("`*")
+        del stack[depth:]
+        if name.endswith("/") or "." not in name.lstrip("."):
+            stack.append(name.rstrip("/"))
+        else:
+            files.append("/".join(stack + [name]))
+    if not files:
+        files = FILE_PATH.findall(plan)
+        # "cli.py calls it" : nom nu d'un chemin déjà cité, pas un nouveau fichier
+        nested = {path.rsplit("/", 1)[1] for path in files if "/" in path}
+        files = [path for path in files if "/" in path or path not in nested]
+    return list(dict.fromkeys(files))
+
+
+def part_instruction(path, index, total):
+    lang = "python" if path.endswith(".py") else ""
+    return (
+        f"@Coder Write ONLY the file `{path}` ({index}/{total}) following the architect's plan. "
+        "The other files are written in parallel: keep names and imports consistent with the "
+        f"plan. Output one ```{lang} block whose first line is `# Nom du fichier: {path}`."
+    )
+
+
+def plan_tasks(request_id, plan):
+    """Commandes par fichier (kwargs de publish_messages), ou None si pas de découpage."""
+    files = parse_plan_files(plan)
+    if not FANOUT_MIN_FILES <= len(files) <= FANOUT_MAX_FILES:
+        return None
+    key = fanout_key(request_id)
+    pipe = r.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, "files", json.dumps(files))
+    pipe.execute()
+    return [
+        {
+            "sender": "manager",
+            "content": part_instruction(path, idx, len(files)),
+            "msg_type": "cmd",
+            "request_id": request_id,
+            "inbox": "coder",
+            "fields": {"file": path},
+        }
+        for idx, path in enumerate(files, start=1)
+    ]
+
+
+def extract_code(content):
+    """Corps du fichier : premier bloc de code (ou tout le texte), sans l'en-tête de nom."""
+    match = CODE_BLOCK.search(content)
+    code = match.group(1) if match else content
+    return FILE_HEADER.sub("", code, count=1).strip("\n")
+
+
+def merge_parts(files, parts):
+    blocks = []
+    for path in files:
+        lang = "python" if path.endswith(".py") else ""
+        blocks.append(f"```{lang}\n# Nom du fichier: {path}\n{extract_code(parts[path])}\n```")
+    return "\n\n".join(blocks)
+
+
+def add_part(request_id, path, content):
+    """Enregistre un fichier livré. Renvoie le code fusionné quand tous sont là, sinon None.
+
+    Les messages d'un projet sont traités un par un par le manager : pas de course ici.
+    """
+    key = fanout_key(request_id)
+    pipe = r.pipeline()
+    pipe.hset(key, f"file:{path}", content)
+    pipe.hgetall(key)
+    state = pipe.execute()[1]
+    if "files" not in state:
+        return None
+    files = json.loads(state["files"])
+    parts = {field[5:]: value for field, value in state.items() if field.startswith("file:")}
+    if any(path not in parts for path in files):
+        return None
+    r.delete(key)
+    return merge_parts(files, parts)
@@ -0,0 +1,149 @@
+"""Couche client LLM partagée : handles de modèle réutilisés, limite d'appels en vol, retries."""
+
+import os
+import random
+import threading
+import time
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+import metrics
+
+# Erreurs qui valent un nouvel essai (quota, surcharge, réseau)
+TRANSIENT_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class LLMError(Exception):
+    """Échec définitif d'un appel modèle (jamais publié comme une réponse)."""
+
+    def __init__(self, model_name, message, transient=False):
+        super().__init__(f"{model_name}: {message}")
+        self.model_name = model_name
+        self.transient = transient
+
+
+def load_model_factory(spec=None):
+    """Fabrique de handles de modèle selon LLM_PROVIDER.
+
+    "gemini" (défaut) : google.generativeai. "fake[:config.json]" : backend simulé
+    (fake_llm.py) pour les benchmarks. "record:cassette.jsonl" / "replay:cassette.jsonl[:timed]" :
+    enregistrement et rejeu des appels réels (cassette.py).
+    Un handle expose generate_content(prompt, stream=False).
+    """
+    spec = spec or os.getenv("LLM_PROVIDER", "gemini")
+    name, _, arg = spec.partition(":")
+    if name == "gemini":
+        return genai.GenerativeModel
+    if name == "fake":
+        import fake_llm
+
+        return fake_llm.FakeModelFactory(arg or None)
+    if name == "record":
+        import cassette
+
+        return cassette.RecordingModelFactory(arg or "cassette.jsonl", genai.GenerativeModel)
+    if name == "replay":
+        import cassette
+
+        timed = arg.endswith(":timed")
+        path = arg[: -len(":timed")] if timed else arg
+        return cassette.ReplayModelFactory(path or "cassette.jsonl", timed=timed)
+    raise ValueError(f"Unknown LLM_PROVIDER: {spec}")
+
+
+class LLMClient:
+    """Client unique par processus pour le manager, les agents et la compression."""
+
+    def __init__(
+        self,
+        max_in_flight=None,
+        max_retries=None,
+        backoff_base=None,
+        backoff_max=None,
+        model_factory=None,
+    ):
+        self.max_in_flight = max_in_flight or int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+        self.max_retries = (
+            max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "4"))
+        )
+        self.backoff_base = backoff_base or float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+        self.backoff_max = backoff_max or float(os.getenv("LLM_BACKOFF_MAX", "30"))
+        self.in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self.model_factory = model_factory or load_model_factory()
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def get_model(self, model_name):
+        """Un seul GenerativeModel par nom : ils partagent le client (et la connexion) genai."""
+        with self.lock:
+            model = self.models.get(model_name)
+            if model is None:
+                model = self.model_factory(model_name)
+                self.models[model_name] = model
+            return model
+
+    def backoff_delay(self, attempt):
+        """Backoff exponentiel avec full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def generate(self, model_name, prompt, on_chunk=None, role=""):
+        """Renvoie le texte généré ou lève LLMError après épuisement des retries.
+
+        Avec on_chunk, le modèle est appelé en streaming et chaque fragment lui est passé
+        dès réception ; on ne réessaie alors que si aucun fragment n'a encore été émis.
+        role ne sert qu'à étiqueter les métriques.
+        """
+        model = self.get_model(model_name)
+        attempt = 0
+        while True:
+            emitted = []
+            try:
+                with self.in_flight, metrics.LLM_SECONDS.time(role=role, model=model_name):
+                    if on_chunk is None:
+                        response = model.generate_content(prompt)
+                        text = response.text
+                    else:
+                        response = None
+                        for response in model.generate_content(prompt, stream=True):
+                            chunk = response.text
+                            if chunk:
+                                on_chunk(chunk)
+                                emitted.append(chunk)
+                        text = "".join(emitted)
+                record_usage(response, role, model_name)
+                return text
+            except TRANSIENT_ERRORS as e:
+                metrics.LLM_ERRORS.inc(role=role, model=model_name, kind="transient")
+                if emitted or attempt >= self.max_retries:
+                    raise LLMError(model_name, e, transient=True) from e
+                delay = self.backoff_delay(attempt)
+                print(
+                    f"LLM retry {attempt + 1}/{self.max_retries} in {delay:.1f}s: {e}", flush=True
+                )
+                time.sleep(delay)
+                attempt += 1
+            except Exception as e:
+                # Blocage sécurité, requête invalide, clé refusée... : inutile de réessayer
+                metrics.LLM_ERRORS.inc(role=role, model=model_name, kind="hard")
+                raise LLMError(model_name, e) from e
+
+
+def record_usage(response, role, model_name):
+    """Compte les tokens d'après usage_metadata (cumulé sur le dernier fragment en streaming)."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    tokens_in = getattr(usage, "prompt_token_count", 0) or 0
+    tokens_out = getattr(usage, "candidates_token_count", 0) or 0
+    metrics.LLM_TOKENS.inc(tokens_in, role=role, model=model_name, direction="in")
+    metrics.LLM_TOKENS.inc(tokens_out, role=role, model=model_name, direction="out")
@@ -0,0 +1,204 @@
+"""Analyse hors-ligne des journaux projet (project_logs/*.jsonl, archive/*.jsonl.gz).
+
+Les fichiers sont lus ligne par ligne, sans jamais être chargés en entier. Chaque intervalle
+entre deux messages consécutifs d'un projet est attribué à l'étape qui l'a produit : le rôle
+de l'agent qui répond, ou "routing" quand c'est le manager qui publie.
+
+Usage :
+    python3 log_analyzer.py project_logs/ --trace trace.json
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+PERCENTILES = (50, 95, 99)
+
+
+def iter_entries(path):
+    """Entrées d'un journal, une par une (JSONL brut ou archive gzip)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def entry_time(entry):
+    """Horodatage (s) : champ timestamp des journaux, ou ID de stream des archives."""
+    if entry.get("timestamp"):
+        return datetime.fromisoformat(entry["timestamp"]).timestamp()
+    entry_id = entry.get("id", "")
+    try:
+        return int(entry_id.split("-", 1)[0]) / 1000
+    except ValueError:
+        return None
+
+
+def stage_of(entry):
+    sender = entry.get("sender", "")
+    return "routing" if sender == "manager" else sender
+
+
+def project_id_of(path):
+    name = os.path.basename(path)
+    for suffix in (".gz", ".jsonl"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return name[len("project_") :] if name.startswith("project_") else name
+
+
+def analyze_project(path, on_segment=None):
+    """Reconstruit la timeline d'un projet.
+
+    on_segment(stage, start, duration, entry) est appelé pour chaque intervalle attribué.
+    """
+    stats = {
+        "project": project_id_of(path),
+        "events": 0,
+        "start": None,
+        "end": None,
+        "stages": defaultdict(lambda: {"count": 0, "seconds": 0.0}),
+        "review_loops": 0,
+    }
+    previous = None
+    for entry in iter_entries(path):
+        if entry.get("status", "DONE") != "DONE":
+            continue
+        ts = entry_time(entry)
+        if ts is None:
+            continue
+        stats["events"] += 1
+        if stats["start"] is None:
+            stats["start"] = ts
+        stats["end"] = ts
+        sender = entry.get("sender", "")
+        if sender == "reviewer" and "VALIDATED" not in entry.get("content", ""):
+            stats["review_loops"] += 1
+        if previous is not None:
+            duration = max(0.0, ts - previous)
+            stage = stats["stages"][stage_of(entry)]
+            stage["count"] += 1
+            stage["seconds"] += duration
+            if on_segment is not None:
+                on_segment(stage_of(entry), previous, duration, entry)
+        previous = ts
+    stats["wall_seconds"] = (stats["end"] - stats["start"]) if stats["events"] else 0.0
+    return stats
+
+
+def percentile(values, pct):
+    """Percentile par interpolation linéaire sur une liste triée."""
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class TraceWriter:
+    """Écrit un fichier Trace Event (chrome://tracing, Perfetto) au fil de l'eau."""
+
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+        self.f.write('{"traceEvents": [\n')
+        self.first = True
+
+    def _write(self, event):
+        if not self.first:
+            self.f.write(",\n")
+        self.first = False
+        self.f.write(json.dumps(event, ensure_ascii=False))
+
+    def name_project(self, pid, project):
+        self._write({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": project}})
+
+    def segment(self, pid, stage, start, duration, entry):
+        self._write(
+            {
+                "name": stage,
+                "cat": entry.get("type", ""),
+                "ph": "X",
+                "ts": int(start * 1_000_000),
+                "dur": int(duration * 1_000_000),
+                "pid": pid,
+                "tid": stage,
+                "args": {"sequence": entry.get("sequence", entry.get("sequence_id"))},
+            }
+        )
+
+    def close(self):
+        self.f.write("\n]}\n")
+        self.f.close()
+
+
+def expand_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(
+                glob.glob(os.path.join(path, "*.jsonl"))
+                + glob.glob(os.path.join(path, "*.jsonl.gz"))
+            )
+        else:
+            yield path
+
+
+def analyze(paths, trace_path=None, out=sys.stdout):
+    """Analyse tous les journaux et imprime le rapport. Renvoie les durées par étape."""
+    durations = defaultdict(list)
+    trace = TraceWriter(trace_path) if trace_path else None
+    projects = []
+    try:
+        for pid, path in enumerate(expand_paths(paths), start=1):
+            if trace:
+                trace.name_project(pid, project_id_of(path))
+
+            def on_segment(stage, start, duration, entry, pid=pid):
+                durations[stage].append(duration)
+                if trace:
+                    trace.segment(pid, stage, start, duration, entry)
+
+            projects.append(analyze_project(path, on_segment))
+    finally:
+        if trace:
+            trace.close()
+
+    for stats in projects:
+        print(
+            f"{stats['project']}: {stats['events']} events, {stats['wall_seconds']:.1f}s wall, "
+            f"{stats['review_loops']} review loops",
+            file=out,
+        )
+        for stage, values in sorted(stats["stages"].items(), key=lambda kv: -kv[1]["seconds"]):
+            share = values["seconds"] / stats["wall_seconds"] * 100 if stats["wall_seconds"] else 0
+            print(
+                f"    {stage:<12} {values['count']:>5}x {values['seconds']:>10.1f}s {share:>5.1f}%",
+                file=out,
+            )
+
+    header = " ".join(f"{'p' + str(p):>9}" for p in PERCENTILES)
+    print(f"\n{'STAGE':<12} {'N':>6} {header}   (seconds, {len(projects)} projects)", file=out)
+    for stage, values in sorted(durations.items()):
+        values.sort()
+        cells = " ".join(f"{percentile(values, p):>9.2f}" for p in PERCENTILES)
+        print(f"{stage:<12} {len(values):>6} {cells}", file=out)
+    return durations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage latency report for project logs")
+    parser.add_argument("paths", nargs="*", default=["project_logs"], help="Files or directories")
+    parser.add_argument("--trace", help="Write a Trace Event JSON file (chrome://tracing)")
+    args = parser.parse_args()
+    analyze(args.paths, args.trace)
@@ -0,0 +1,135 @@
+"""Écriture des journaux projet (project_logs/*.jsonl) hors du chemin de publication."""
+
+import atexit
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_CLOSE = object()  # marqueur de fin de projet dans la file
+_STOP = object()
+
+
+def exit_on_sigterm():
+    """SIGTERM (pkill des scripts) -> SystemExit, pour que atexit vide la file avant de quitter."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+
+class LogWriter:
+    """Thread d'écriture : les publieurs empilent, le thread écrit par lots.
+
+    Garde un LRU borné de fichiers ouverts par projet, flush + fsync toutes les
+    flush_interval secondes ou à la fin d'un projet, et vide la file à l'arrêt.
+    """
+
+    def __init__(self, log_dir="project_logs", max_open_files=None, flush_interval=None):
+        self.log_dir = log_dir
+        self.max_open_files = max_open_files or int(os.getenv("LOG_MAX_OPEN_FILES", "64"))
+        self.flush_interval = flush_interval or float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+        self.queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        self.handles = OrderedDict()
+        self.dirty = set()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                os.makedirs(self.log_dir, exist_ok=True)
+                self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self.thread.start()
+                atexit.register(self.shutdown)
+
+    def write(self, request_id, entry):
+        """Empile une entrée ; bloque seulement si la file est pleine."""
+        self.start()
+        self.queue.put((request_id, entry))
+
+    def close_project(self, request_id):
+        """Flush, fsync et ferme le fichier d'un projet terminé."""
+        self.start()
+        self.queue.put((request_id, _CLOSE))
+
+    def shutdown(self, timeout=10):
+        """Vide la file puis ferme tous les fichiers."""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        self.queue.put((None, _STOP))
+        thread.join(timeout)
+
+    def _handle(self, request_id):
+        handle = self.handles.get(request_id)
+        if handle is not None:
+            self.handles.move_to_end(request_id)
+            return handle
+        if len(self.handles) >= self.max_open_files:
+            old_id, old_handle = self.handles.popitem(last=False)
+            self._sync(old_id, old_handle)
+            old_handle.close()
+        path = os.path.join(self.log_dir, f"project_{request_id}.jsonl")
+        handle = open(path, "a", encoding="utf-8")
+        self.handles[request_id] = handle
+        return handle
+
+    def _sync(self, request_id, handle):
+        if request_id in self.dirty:
+            handle.flush()
+            os.fsync(handle.fileno())
+            self.dirty.discard(request_id)
+
+    def _sync_all(self):
+        for request_id, handle in self.handles.items():
+            self._sync(request_id, handle)
+
+    def _close(self, request_id):
+        handle = self.handles.pop(request_id, None)
+        if handle is not None:
+            self._sync(request_id, handle)
+            handle.close()
+
+    def _run(self):
+        last_sync = time.monotonic()
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_sync))
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            # Draine tout ce qui est déjà disponible pour écrire par lots
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for request_id, entry in batch:
+                try:
+                    if entry is _STOP:
+                        stopping = True
+                    elif entry is _CLOSE:
+                        self._close(request_id)
+                    else:
+                        self._handle(request_id).write(json.dumps(entry, ensure_ascii=False) + "\n")
+                        self.dirty.add(request_id)
+                except OSError as e:
+                    print(f"Log writer error ({request_id}): {e}", flush=True)
+
+            if stopping or time.monotonic() - last_sync >= self.flush_interval:
+                try:
+                    self._sync_all()
+                except OSError as e:
+                    print(f"Log writer error: {e}", flush=True)
+                last_sync = time.monotonic()
+
+        for request_id in list(self.handles):
+            self._close(request_id)
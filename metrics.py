@@ -0,0 +1,197 @@
+"""Métriques en mémoire exposées au format texte Prometheus (un endpoint par processus)."""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "n": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["n"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key, state):
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            labels = _format_labels(self.label_names, key, [("le", bound)])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _format_labels(self.label_names, key, [("le", "+Inf")])
+        lines.append(f"{self.name}_bucket{labels} {state['n']}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {state['sum']}")
+        lines.append(f"{self.name}_count{labels} {state['n']}")
+        return lines
+
+
+REGISTRY = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+MESSAGES = _register(Counter("factory_messages_total", "Messages published", ("sender", "type")))
+PUBLISH_SECONDS = _register(
+    Histogram("factory_publish_seconds", "publish_message latency", ("sender",))
+)
+LLM_SECONDS = _register(Histogram("factory_llm_seconds", "Model call latency", ("role", "model")))
+LLM_TOKENS = _register(
+    Counter("factory_llm_tokens_total", "Model tokens", ("role", "model", "direction"))
+)
+LLM_ERRORS = _register(
+    Counter("factory_llm_errors_total", "Model call failures", ("role", "model", "kind"))
+)
+CACHE_LOOKUPS = _register(
+    Counter("factory_cache_lookups_total", "Response cache lookups", ("result",))
+)
+CONTEXT_SECONDS = _register(
+    Histogram("factory_context_build_seconds", "build_smart_context latency")
+)
+QUEUE_WAIT_SECONDS = _register(
+    Histogram("factory_queue_wait_seconds", "Stream entry age when processing starts", ("role",))
+)
+HANDLE_SECONDS = _register(
+    Histogram("factory_handle_seconds", "Message handling latency", ("role",))
+)
+HANDLE_ERRORS = _register(Counter("factory_handle_errors_total", "Loop errors", ("role",)))
+ROUTING_DECISIONS = _register(
+    Counter("factory_routing_decisions_total", "Manager routing decisions", ("path",))
+)
+BUDGET_STOPS = _register(
+    Counter("factory_budget_stops_total", "Projects stopped by their budget", ("action",))
+)
+REVIEW_MODES = _register(
+    Counter("factory_review_modes_total", "Reviews sent in full or as a diff", ("mode",))
+)
+QUEUE_DEPTH = _register(Gauge("factory_queue_depth", "Tasks waiting in a worker pool", ("role",)))
+
+
+def entry_age(entry_id):
+    """Âge (s) d'une entrée de stream d'après son ID (<ms>-<seq>)."""
+    try:
+        return max(0.0, time.time() - int(entry_id.split("-", 1)[0]) / 1000)
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """Sert /metrics sur le port donné (ou METRICS_PORT). None si aucun port ou port occupé."""
+    port = int(port if port is not None else os.getenv("METRICS_PORT", "0"))
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        # Port déjà pris (ex. METRICS_PORT commun à tous les processus) : on tourne sans
+        print(f"⚠️ Metrics disabled, cannot bind :{port}: {e}", flush=True)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Metrics on :{port}/metrics", flush=True)
+    return server
@@ -0,0 +1,80 @@
+"""Stockage adressé par contenu des gros messages (payload:{sha256}, compressé zlib).
+
+Au-delà de PAYLOAD_THRESHOLD octets, le contenu d'un message quitte l'entrée de flux : il
+est écrit une seule fois sous la clé de son hash et l'entrée ne garde que le hash, la taille
+et un aperçu. Un contenu ne change jamais pour un hash donné, donc chaque processus garde
+les payloads déjà lus dans un LRU local.
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+PREVIEW_CHARS = 200
+
+
+class PayloadStore:
+    def __init__(self, redis_client, threshold=None, ttl=None, max_local=None, prefix="payload"):
+        # Client sans decode_responses : les valeurs sont des octets compressés
+        self.redis = redis_client
+        self.threshold = threshold or int(os.getenv("PAYLOAD_THRESHOLD", "4096"))
+        self.ttl = ttl or int(os.getenv("PAYLOAD_TTL", "604800"))
+        self.max_local = max_local or int(os.getenv("PAYLOAD_LOCAL_MAX_ENTRIES", "256"))
+        self.prefix = prefix
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(content):
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _remember(self, digest, content):
+        with self.lock:
+            self.local[digest] = content
+            self.local.move_to_end(digest)
+            while len(self.local) > self.max_local:
+                self.local.popitem(last=False)
+
+    def offload(self, message):
+        """Copie du message où un gros `content` est remplacé par payload/size/preview."""
+        content = message.get("content")
+        if not isinstance(content, str):
+            return message
+        size = len(content.encode("utf-8"))
+        if size < self.threshold:
+            return message
+        digest = self.make_key(content)
+        key = f"{self.prefix}:{digest}"
+        pipe = self.redis.pipeline(transaction=False)
+        # Écrit une seule fois ; un contenu répété ne fait que prolonger le TTL
+        pipe.set(key, zlib.compress(content.encode("utf-8")), nx=True, ex=self.ttl)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        self._remember(digest, content)
+        stored = {k: v for k, v in message.items() if k != "content"}
+        stored.update({"payload": digest, "size": size, "preview": content[:PREVIEW_CHARS]})
+        return stored
+
+    def get_many(self, digests):
+        """{hash: contenu} ; les payloads expirés sont absents."""
+        found = {}
+        missing = []
+        with self.lock:
+            for digest in dict.fromkeys(digests):
+                if digest in self.local:
+                    self.local.move_to_end(digest)
+                    found[digest] = self.local[digest]
+                else:
+                    missing.append(digest)
+        if missing:
+            values = self.redis.mget([f"{self.prefix}:{digest}" for digest in missing])
+            for digest, value in zip(missing, values):
+                if value is not None:
+                    found[digest] = zlib.decompress(value).decode("utf-8")
+                    self._remember(digest, found[digest])
+        return found
+
+    def get(self, digest):
+        return self.get_many([digest]).get(digest)
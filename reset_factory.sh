@@ -2,9 +2,11 @@
 echo "💣 FACTORY RESET..."
 pkill -f "python3 agent_" || true
 pkill -f "python3 client_" || true
+pkill -f "python3 retention.py" || true
+pkill -f "python3 summarizer.py" || true
 rm -f logs/*.log 2>/dev/null
 rm -f project_logs/*.jsonl 2>/dev/null
-rm -f livrables/*.py 2>/dev/null
+rm -rf livrables/* 2>/dev/null
 if [ "$(docker ps -q -f name=redis-lab)" ]; then
     docker exec redis-lab redis-cli FLUSHALL > /dev/null
 fi
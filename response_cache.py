@@ -0,0 +1,114 @@
+"""Cache des réponses modèle : LRU en mémoire + tier Redis partagé avec TTL."""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+DEFAULT_TTL = 3600
+
+
+def get_cache_ttl(role):
+    """TTL du cache pour un rôle (CACHE_TTL_<ROLE> sinon CACHE_TTL). 0 désactive le cache."""
+    return int(os.getenv(f"CACHE_TTL_{role.upper()}", os.getenv("CACHE_TTL", DEFAULT_TTL)))
+
+
+class ResponseCache:
+    """Cache à deux niveaux indexé par sha256(modèle + prompt complet).
+
+    Le tier local est un LRU borné ; le tier Redis (optionnel) est partagé entre processus,
+    chaque entrée a un TTL et un index trié par date d'écriture borne le nombre d'entrées.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        max_local=None,
+        max_redis=None,
+        prefix="llm_cache",
+    ):
+        self.redis = redis_client
+        self.max_local = max_local or int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "256"))
+        self.max_redis = max_redis or int(os.getenv("CACHE_REDIS_MAX_ENTRIES", "5000"))
+        self.prefix = prefix
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(model_name, prompt):
+        return hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _count(self, name):
+        metrics.CACHE_LOOKUPS.inc(result=name)
+        with self.lock:
+            self.stats[name] += 1
+        if self.redis is not None:
+            try:
+                self.redis.hincrby(f"{self.prefix}:stats", name, 1)
+            except Exception:
+                pass
+
+    def get(self, key):
+        """Renvoie la réponse en cache ou None."""
+        now = time.time()
+        with self.lock:
+            item = self.local.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self.local.move_to_end(key)
+                else:
+                    del self.local[key]
+                    item = None
+        if item is not None:
+            self._count("local_hits")
+            return value
+
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.get(f"{self.prefix}:{key}")
+                pipe.ttl(f"{self.prefix}:{key}")
+                value, ttl = pipe.execute()
+            except Exception as e:
+                print(f"Cache error: {e}", flush=True)
+                value = None
+            if value is not None:
+                self._store_local(key, value, ttl if ttl and ttl > 0 else DEFAULT_TTL)
+                self._count("redis_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        self._store_local(key, value, ttl)
+        if self.redis is None:
+            return
+        index_key = f"{self.prefix}:index"
+        try:
+            pipe = self.redis.pipeline()
+            pipe.set(f"{self.prefix}:{key}", value, ex=ttl)
+            pipe.zadd(index_key, {key: time.time()})
+            pipe.zcard(index_key)
+            size = pipe.execute()[-1]
+            if size > self.max_redis:
+                # Éviction des plus anciennes écritures au-delà de la borne
+                evicted = self.redis.zpopmin(index_key, size - self.max_redis)
+                if evicted:
+                    self.redis.delete(*[f"{self.prefix}:{k}" for k, _ in evicted])
+        except Exception as e:
+            print(f"Cache error: {e}", flush=True)
+
+    def _store_local(self, key, value, ttl):
+        with self.lock:
+            self.local[key] = (time.time() + ttl, value)
+            self.local.move_to_end(key)
+            while len(self.local) > self.max_local:
+                self.local.popitem(last=False)
@@ -0,0 +1,56 @@
+"""Archiveur : déplace les flux des projets terminés vers des fichiers compressés.
+
+Les projets sont inscrits dans projects:finished par leur message "end" (utils.expire_project).
+Après ARCHIVE_DELAY secondes, leur flux est écrit dans archive/project_{id}.jsonl.gz puis
+supprimé de Redis. Les autres clés du projet expirent d'elles-mêmes (PROJECT_TTL).
+"""
+
+import gzip
+import json
+import os
+import time
+
+from utils import FINISHED_PROJECTS_KEY, project_stream_key, r, read_project_entries
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_DELAY = int(os.getenv("ARCHIVE_DELAY", "600"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "60"))
+
+
+def archive_project(request_id, archive_dir=ARCHIVE_DIR):
+    """Écrit le flux du projet dans un fichier gzip puis le supprime de Redis."""
+    entries = read_project_entries(request_id)
+    if entries:
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"project_{request_id}.jsonl.gz")
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for entry_id, data in entries:
+                f.write(json.dumps({"id": entry_id, **data}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+    r.delete(project_stream_key(request_id))
+    r.zrem(FINISHED_PROJECTS_KEY, request_id)
+    return len(entries)
+
+
+def archive_due_projects(delay=ARCHIVE_DELAY):
+    """Archive tous les projets terminés depuis plus de delay secondes."""
+    due = r.zrangebyscore(FINISHED_PROJECTS_KEY, "-inf", time.time() - delay)
+    for request_id in due:
+        count = archive_project(request_id)
+        print(f"📦 Archived {request_id} ({count} entries)", flush=True)
+    return due
+
+
+def run_archiver():
+    print("📦 ARCHIVER", flush=True)
+    while True:
+        try:
+            archive_due_projects()
+        except Exception as e:
+            print(f"Err archiver: {e}", flush=True)
+        time.sleep(ARCHIVE_INTERVAL)
+
+
+if __name__ == "__main__":
+    run_archiver()
@@ -0,0 +1,54 @@
+"""Revue incrémentale : après une première revue complète, le reviewer ne reçoit plus que le
+diff unifié depuis la version qu'il a déjà revue, avec ses remarques encore ouvertes.
+
+project:{id}:review garde le code revu et les remarques de la dernière revue. Si le diff
+dépasse REVIEW_DIFF_MAX_RATIO de la taille du code, on repasse en revue complète.
+"""
+
+import difflib
+import os
+
+import metrics
+from utils import r
+
+REVIEW_DIFF_MAX_RATIO = float(os.getenv("REVIEW_DIFF_MAX_RATIO", "0.5"))
+
+
+def review_key(request_id):
+    return f"project:{request_id}:review"
+
+
+def review_input(previous_code, findings, code, max_ratio=REVIEW_DIFF_MAX_RATIO):
+    """("full", code) ou ("diff", diff unifié) selon ce qui a changé depuis la dernière revue."""
+    if not previous_code or not findings:
+        return "full", code
+    diff = "".join(
+        difflib.unified_diff(
+            previous_code.splitlines(keepends=True),
+            code.splitlines(keepends=True),
+            fromfile="reviewed",
+            tofile="current",
+        )
+    )
+    if len(diff) > max_ratio * len(code):
+        return "full", code
+    return "diff", diff or "(no changes)"
+
+
+def build_context(request_id, code, instruction, system_prompt):
+    """Contexte du reviewer : code complet, ou diff + remarques de la revue précédente."""
+    state = r.hgetall(review_key(request_id))
+    mode, text = review_input(state.get("code"), state.get("findings"), code)
+    metrics.REVIEW_MODES.inc(mode=mode)
+    if mode == "full":
+        return f"CODE:\n{text}\nIN:\n{instruction}\nROLE:{system_prompt}"
+    return (
+        f"PREVIOUS FINDINGS:\n{state['findings']}\n"
+        f"DIFF SINCE YOUR LAST REVIEW:\n{text}\n"
+        "CHECK: every previous finding is fixed and the diff adds no new issue.\n"
+        f"IN:\n{instruction}\nROLE:{system_prompt}"
+    )
+
+
+def save(request_id, code, findings):
+    r.hset(review_key(request_id), mapping={"code": code, "findings": findings})
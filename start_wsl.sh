@@ -4,21 +4,27 @@ cleanup() {
     echo "🛑 STOPPING FACTORY..."
     pkill -f "python3 agent_" || true
     pkill -f "python3 client_" || true
-    if [ "$(docker ps -q -f name=redis-lab)" ]; then
-        docker exec redis-lab redis-cli FLUSHALL > /dev/null
-    fi
+    pkill -f "python3 retention.py" || true
+    pkill -f "python3 summarizer.py" || true
     echo "✅ CLEAN EXIT."
 }
 trap cleanup EXIT SIGINT SIGTERM
 
 echo "🚀 STARTING SILENT FACTORY..."
-mkdir -p logs livrables project_logs
+mkdir -p logs livrables project_logs archive
 
 python3 agent_manager.py > logs/manager.log 2>&1 &
+python3 retention.py > logs/archiver.log 2>&1 &
+python3 summarizer.py > logs/summarizer.log 2>&1 &
 python3 agent_generic.py --role analyst > logs/analyst.log 2>&1 &
 python3 agent_generic.py --role architect > logs/architect.log 2>&1 &
-python3 agent_generic.py --role coder > logs/coder.log 2>&1 &
-python3 agent_generic.py --role reviewer > logs/reviewer.log 2>&1 &
+# Plusieurs workers par rôle se partagent le travail via un consumer group Redis
+for i in $(seq 1 "${CODER_WORKERS:-1}"); do
+    python3 agent_generic.py --role coder --consumer "coder-$i" > "logs/coder-$i.log" 2>&1 &
+done
+for i in $(seq 1 "${REVIEWER_WORKERS:-1}"); do
+    python3 agent_generic.py --role reviewer --consumer "reviewer-$i" > "logs/reviewer-$i.log" 2>&1 &
+done
 
 sleep 2
 python3 client_terminal.py
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Résumeur en arrière-plan : tient project:{id}:summary à jour avant qu'un agent le demande.
+
+Il suit le flux de contrôle via son propre consumer group. Dès que les entrées non couvertes
+d'un projet dépassent le budget de queue du rôle le plus contraint (budget du rôle moins le
+résumé, comme dans build_smart_context), les plus anciennes sont
+compressées (compress_history) et une nouvelle version du résumé est publiée avec l'ID de la
+dernière entrée couverte. build_smart_context se contente de lire ce résumé et la queue restante.
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import metrics
+from agent_generic import get_default_consumer
+from context_budget import compression_budget, split_for_compression
+from utils import (
+    STREAM_KEY,
+    commit_summary,
+    compress_history,
+    ensure_group,
+    format_entry,
+    get_summary,
+    r,
+    read_project_entries,
+)
+from worker_pool import KeyedWorkerPool
+
+GROUP = "summarizer"
+SUMMARIZER_WORKERS = int(os.getenv("SUMMARIZER_WORKERS", "4"))
+# Rôles dont le prompt passe par build_smart_context (le reviewer lit le code directement)
+CONTEXT_ROLES = ("manager", "analyst", "architect", "coder")
+
+
+def summarize_project(request_id):
+    """Compresse la partie ancienne de la queue si elle dépasse le budget.
+
+    Renvoie True si une nouvelle version du résumé a été publiée.
+    """
+    summary = get_summary(request_id)
+    entries = read_project_entries(request_id, summary["upto"])
+    budget = compression_budget(CONTEXT_ROLES, summary["text"])
+    to_compress, _ = split_for_compression(entries, budget, format_entry)
+    if not to_compress:
+        return False
+    text = compress_history(
+        summary["text"], "\n".join(format_entry(data) for _, data in to_compress)
+    )
+    if text is None:
+        return False
+    return commit_summary(request_id, text, summary["version"], to_compress[-1][0])
+
+
+class Scheduler:
+    """Une tâche au plus en attente par projet ; l'activité pendant la compression
+    reprogramme le projet une fois la passe en cours terminée."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.lock = threading.Lock()
+        self.scheduled = set()
+
+    def touch(self, request_id):
+        with self.lock:
+            if request_id in self.scheduled:
+                return
+            self.scheduled.add(request_id)
+        self.pool.submit(request_id, self._run, request_id)
+
+    def _run(self, request_id):
+        with self.lock:
+            self.scheduled.discard(request_id)
+        with metrics.HANDLE_SECONDS.time(role="summarizer"):
+            if summarize_project(request_id):
+                print(f"🗜️ Summary updated [{request_id[:8]}]", flush=True)
+
+
+def run_summarizer(workers=None, consumer=None):
+    consumer = consumer or get_default_consumer()
+    print(f"🗜️ SUMMARIZER [{GROUP}/{consumer}]", flush=True)
+    ensure_group(STREAM_KEY, GROUP)
+    scheduler = Scheduler(KeyedWorkerPool(workers or SUMMARIZER_WORKERS, name="summarizer"))
+
+    while True:
+        try:
+            messages = r.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=100, block=5000)
+            if not messages:
+                continue
+            ids = []
+            for msg_id, data in messages[0][1]:
+                ids.append(msg_id)
+                req_id = data.get("request_id")
+                # Les fragments STREAMING et les projets terminés n'appellent pas de résumé
+                if req_id and data.get("status") == "DONE" and data.get("type") != "end":
+                    scheduler.touch(req_id)
+            # Best effort : une entrée perdue sera rattrapée au prochain message du projet
+            r.xack(STREAM_KEY, GROUP, *ids)
+            metrics.QUEUE_DEPTH.set(scheduler.pool.queue_depth(), role="summarizer")
+        except Exception as e:
+            metrics.HANDLE_ERRORS.inc(role="summarizer")
+            print(f"Err summarizer: {e}", flush=True)
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, help="Concurrent projects (SUMMARIZER_WORKERS)")
+    parser.add_argument("--consumer", help="Consumer name in the summarizer group")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics (default: METRICS_PORT)")
+    args = parser.parse_args()
+    metrics.start_metrics_server(args.metrics_port)
+    run_summarizer(args.workers, args.consumer)
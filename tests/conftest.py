@@ -0,0 +1,21 @@
+"""Shared fixtures."""
+
+import pytest
+
+import utils
+from payload_store import PayloadStore
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """utils wired to an in-memory Redis that runs the Lua publish script."""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(utils, "r", client)
+    monkeypatch.setattr(utils, "publish_script", client.register_script(utils.PUBLISH_LUA))
+    monkeypatch.setattr(
+        utils, "payload_store", PayloadStore(fakeredis.FakeRedis(server=server), threshold=100)
+    )
+    monkeypatch.setattr(utils, "log_to_disk", lambda *args: None)
+    return client
@@ -0,0 +1,92 @@
+"""Tests for the generic agent worker."""
+
+import agent_generic
+import utils
+
+
+def command(**fields):
+    return {
+        "request_id": "p1",
+        "sender": "manager",
+        "type": "cmd",
+        "status": "DONE",
+        "content": "@Coder Write the code",
+        **fields,
+    }
+
+
+class TestHandleMessage:
+    """Tests for the handling of one inbox command."""
+
+    def run(self, monkeypatch, data):
+        calls = {}
+
+        def get_ai_response(role, prompt, context, on_chunk=None):
+            calls["on_chunk"] = on_chunk
+            return "print('ok')"
+
+        monkeypatch.setattr(agent_generic, "build_smart_context", lambda request_id, role: "")
+        monkeypatch.setattr(agent_generic, "get_ai_response", get_ai_response)
+        monkeypatch.setattr(
+            agent_generic,
+            "publish_message",
+            lambda *args, **kwargs: calls.setdefault("published", (args, kwargs)),
+        )
+        agent_generic.handle_message("coder", data)
+        return calls
+
+    def test_whole_code_task_is_streamed(self, monkeypatch):
+        """A single coder task streams its answer."""
+        monkeypatch.setattr(agent_generic, "STREAM_ROLES", ["coder"])
+        calls = self.run(monkeypatch, command())
+        assert calls["on_chunk"] is not None
+        assert calls["published"][0][2] == "code"
+
+    def test_file_task_is_not_streamed(self, monkeypatch):
+        """Parallel per-file tasks do not stream, so their fragments never interleave."""
+        monkeypatch.setattr(agent_generic, "STREAM_ROLES", ["coder"])
+        calls = self.run(monkeypatch, command(file="main.py"))
+        assert calls["on_chunk"] is None
+        assert calls["published"][0][2] == "code_part"
+        assert calls["published"][1]["fields"] == {"file": "main.py"}
+
+
+class TestClaimStaleEntries:
+    """Tests for taking over commands left pending by a dead worker."""
+
+    def deliver(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(agent_generic, "r", fake_redis)
+        monkeypatch.setattr(agent_generic, "CLAIM_IDLE_MS", 0)
+        utils.publish_message(
+            "manager",
+            "@Coder Write main.py",
+            "cmd",
+            "p1",
+            inbox="coder",
+            fields={"file": "main.py"},
+        )
+        group = agent_generic.get_group_name("coder")
+        utils.ensure_group(utils.inbox_key("coder"), group, "0")
+        fake_redis.xreadgroup(group, "dead", {utils.inbox_key("coder"): ">"}, count=1)
+        return group
+
+    def test_pending_entry_is_claimed(self, fake_redis, monkeypatch):
+        """An entry idle on another consumer is handed to this worker."""
+        group = self.deliver(fake_redis, monkeypatch)
+        _, entries = agent_generic.claim_stale_entries("coder", group, "alive", "0-0")
+        ((_, data),) = entries
+        assert data["content"] == "@Coder Write main.py"
+        assert fake_redis.xpending(utils.inbox_key("coder"), group)["pending"] == 1
+
+    def test_entry_dropped_after_max_deliveries_reports_an_error(self, fake_redis, monkeypatch):
+        """A poison command is acknowledged and reported to the manager with its task."""
+        monkeypatch.setattr(agent_generic, "MAX_DELIVERIES", 1)
+        group = self.deliver(fake_redis, monkeypatch)
+        _, entries = agent_generic.claim_stale_entries("coder", group, "alive", "0-0")
+        assert entries == []
+        assert fake_redis.xpending(utils.inbox_key("coder"), group)["pending"] == 0
+        _, error = fake_redis.xrange(utils.STREAM_KEY)[-1]
+        assert error["type"] == "error"
+        assert error["status"] == "ERROR"
+        assert error["task"] == "@Coder Write main.py"
+        assert error["file"] == "main.py"
@@ -0,0 +1,137 @@
+"""Tests for the manager's deterministic routing."""
+
+import time
+
+import agent_manager
+from agent_manager import route_by_rules
+
+
+class TestRouteByRules:
+    """Tests for the rule-based fast path of decide_next_step."""
+
+    def test_pipeline_transitions(self):
+        """Each expected producer hands over to the next stage."""
+        assert route_by_rules("analyst", "specs", "@Analyst")[0] == "@Architect"
+        assert route_by_rules("architect", "tree", "@Architect")[0] == "@Coder"
+        assert route_by_rules("coder", "code", "@Coder")[0] == "@Reviewer"
+
+    def test_user_input_goes_to_analyst(self):
+        """A user order starts at the analyst."""
+        target, instruction = route_by_rules("user", "Build a CLI", None)
+        assert target == "@Analyst"
+        assert "Build a CLI" in instruction
+
+    def test_review_outcomes(self):
+        """A validated review finishes; a failed one goes back to the coder with the fixes."""
+        assert route_by_rules("reviewer", "VALIDATED", "@Reviewer") == ("FINISH", "OK")
+        target, instruction = route_by_rules("reviewer", "- fix the import", "@Reviewer")
+        assert target == "@Coder"
+        assert "fix the import" in instruction
+
+    def test_unexpected_sender_is_ambiguous(self):
+        """A role answering out of turn is left to the LLM router."""
+        assert route_by_rules("architect", "tree", "@Analyst") is None
+        assert route_by_rules("coder", "code", None) is None
+
+
+class TestHandleError:
+    """Tests for retries after an agent's model failure."""
+
+    def install(self, monkeypatch, errors):
+        self.published = []
+        self.stopped = []
+        monkeypatch.setattr(agent_manager, "get_stage", lambda request_id: "@Coder")
+        monkeypatch.setattr(
+            agent_manager.budget, "record_error", lambda request_id: {"errors": str(errors)}
+        )
+        monkeypatch.setattr(
+            agent_manager,
+            "publish_message",
+            lambda *args, **kwargs: self.published.append((args, kwargs)),
+        )
+        monkeypatch.setattr(
+            agent_manager, "stop_project", lambda request_id, reason: self.stopped.append(reason)
+        )
+
+    def error(self):
+        return {
+            "request_id": "p1",
+            "sender": "coder",
+            "type": "error",
+            "status": "ERROR",
+            "content": "AI ERROR: quota",
+            "task": "@Coder Write ONLY the file `main.py`",
+            "file": "main.py",
+        }
+
+    def test_failed_task_is_sent_again(self, monkeypatch):
+        """Within the error budget, the same command goes back to the role's inbox."""
+        self.install(monkeypatch, errors=1)
+        agent_manager.handle_message(self.error())
+        ((args, kwargs),) = self.published
+        assert args[:3] == ("manager", "@Coder Write ONLY the file `main.py`", "cmd")
+        assert kwargs["inbox"] == "coder"
+        assert kwargs["fields"] == {"file": "main.py"}
+        assert not self.stopped
+
+    def test_project_stops_after_too_many_failures(self, monkeypatch):
+        """Past BUDGET_MAX_ERRORS the project is ended through stop_project."""
+        self.install(monkeypatch, errors=agent_manager.budget.LIMITS["errors"] + 1)
+        agent_manager.handle_message(self.error())
+        assert not self.published
+        assert "model failures" in self.stopped[0]
+
+
+class TestDecideNextStep:
+    """Tests for the LLM routing path."""
+
+    def test_unparseable_answer_still_counts_a_model_call(self, monkeypatch):
+        """The fallback route does not escape the model-call budget."""
+        calls = []
+        monkeypatch.setattr(agent_manager, "get_stage", lambda request_id: None)
+        monkeypatch.setattr(agent_manager, "build_smart_context", lambda request_id, role: "")
+        monkeypatch.setattr(agent_manager, "get_ai_response", lambda *args: "not json")
+        monkeypatch.setattr(agent_manager, "count_decision", lambda path: None)
+        monkeypatch.setattr(agent_manager.budget, "add_model_call", calls.append)
+        assert agent_manager.decide_next_step("architect", "tree", "p1")[0] == "@Analyst"
+        assert calls == ["p1"]
+
+
+class TestDeadlineSweep:
+    """Tests for stopping stalled projects without a new message."""
+
+    def wire(self, fake_redis, monkeypatch):
+        monkeypatch.setattr(agent_manager, "r", fake_redis)
+        monkeypatch.setattr(agent_manager.budget, "r", fake_redis)
+        monkeypatch.setitem(agent_manager.budget.LIMITS, "deadline", 0)
+
+    def test_stalled_project_is_stopped(self, fake_redis, monkeypatch):
+        """A project past its deadline is found by the sweep and stopped."""
+        self.wire(fake_redis, monkeypatch)
+        stopped = []
+        monkeypatch.setattr(
+            agent_manager, "stop_project", lambda request_id, reason: stopped.append(reason)
+        )
+        agent_manager.budget.start("p1")
+        assert agent_manager.budget.overdue(now=time.time() + 1) == ["p1"]
+        agent_manager.check_deadline("p1")
+        assert "running for" in stopped[0]
+
+    def test_finished_projects_leave_the_sweep(self, fake_redis, monkeypatch):
+        """Stopped projects are removed from the deadline set instead of being stopped again."""
+        self.wire(fake_redis, monkeypatch)
+        agent_manager.budget.start("p1")
+        agent_manager.set_stage("p1", "STOPPED")
+        agent_manager.check_deadline("p1")
+        assert agent_manager.budget.overdue(now=time.time() + 1) == []
+
+    def test_escalated_project_keys_expire(self, fake_redis, monkeypatch):
+        """Escalation pauses the project and gives its keys a TTL."""
+        self.wire(fake_redis, monkeypatch)
+        monkeypatch.setattr(agent_manager.budget, "BUDGET_ACTION", "escalate")
+        agent_manager.budget.start("p1")
+        agent_manager.stop_project("p1", "too slow")
+        assert agent_manager.get_stage("p1") == "ESCALATED"
+        assert fake_redis.ttl("project:p1:stage") > 0
+        assert fake_redis.ttl("project:p1:budget") > 0
+        assert agent_manager.budget.overdue(now=time.time() + 1) == []
@@ -0,0 +1,85 @@
+"""Tests for the manifest-driven artifact writer."""
+
+import os
+
+import pytest
+
+import artifacts
+
+CODE = """Here is the code.
+```python
+# Nom du fichier: app/main.py
+print("hello")
+```
+```
+# Nom du fichier: requirements.txt
+requests
+```
+```bash
+pip install -r requirements.txt
+```
+"""
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "ARTIFACTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+class TestParseFiles:
+    """Tests for extracting named files from coder output."""
+
+    def test_named_blocks(self):
+        """Headers give the path; blocks without a name or Python code are skipped."""
+        assert artifacts.parse_files(CODE) == {
+            "app/main.py": 'print("hello")\n',
+            "requirements.txt": "requests\n",
+        }
+
+    def test_unnamed_python_blocks(self):
+        """Python blocks without a header keep the legacy script_{n}.py names."""
+        content = "```python\na = 1\n```\n```python\nb = 2\n```"
+        assert artifacts.parse_files(content) == {
+            "script_1.py": "a = 1\n",
+            "script_2.py": "b = 2\n",
+        }
+
+    def test_paths_cannot_escape_project_dir(self):
+        """Absolute and parent paths are rejected."""
+        assert artifacts.safe_path("../etc/passwd") is None
+        assert artifacts.safe_path("/etc/passwd") is None
+        assert artifacts.safe_path("./src/../app.py") == "app.py"
+
+
+class TestSave:
+    """Tests for incremental writes and the manifest."""
+
+    def test_first_save_writes_files_and_manifest(self, workdir):
+        """Every file is written under the project directory and listed with its hash."""
+        manifest, changed = artifacts.save("p1", CODE)
+        assert changed == ["app/main.py", "requirements.txt"]
+        assert (workdir / "p1" / "app" / "main.py").read_text() == 'print("hello")\n'
+        assert manifest["version"] == 1
+        assert manifest["files"]["requirements.txt"]["sha256"] == artifacts.sha256("requests\n")
+        assert artifacts.load_manifest("p1") == manifest
+
+    def test_unchanged_files_are_not_rewritten(self, workdir):
+        """Saving the same code again touches nothing."""
+        artifacts.save("p1", CODE)
+        path = workdir / "p1" / "app" / "main.py"
+        os.utime(path, (0, 0))
+        manifest, changed = artifacts.save("p1", CODE)
+        assert changed == []
+        assert manifest["version"] == 1
+        assert path.stat().st_mtime == 0
+
+    def test_changed_since(self, workdir):
+        """Only modified files get the new version; consumers sync from their last version."""
+        artifacts.save("p1", CODE)
+        fixed = CODE.replace('print("hello")', 'print("fixed")')
+        manifest, changed = artifacts.save("p1", fixed)
+        assert changed == ["app/main.py"]
+        assert artifacts.changed_since(manifest, 1) == ["app/main.py"]
+        assert artifacts.changed_since(manifest, 0) == ["app/main.py", "requirements.txt"]
+        assert not [p for p in os.listdir(workdir / "p1") if p.startswith(".tmp-")]
@@ -0,0 +1,55 @@
+"""Tests for the asyncio runtime dispatcher."""
+
+import asyncio
+
+from async_runtime import OrderedDispatcher
+
+
+class TestOrderedDispatcher:
+    """Tests for per-request ordering and cross-request concurrency."""
+
+    async def test_same_key_runs_in_order(self):
+        """Jobs for one request_id run one after the other, in submission order."""
+        dispatcher = OrderedDispatcher(concurrency=4)
+        seen = []
+
+        def make_job(idx, delay):
+            async def job():
+                await asyncio.sleep(delay)
+                seen.append(idx)
+
+            return job
+
+        tasks = [dispatcher.submit("req-1", make_job(i, 0.03 - i * 0.01)) for i in range(3)]
+        await asyncio.gather(*tasks)
+        assert seen == [0, 1, 2]
+        assert dispatcher.pending == 0
+
+    async def test_different_keys_run_concurrently(self):
+        """Jobs for different request_ids overlap up to the concurrency limit."""
+        dispatcher = OrderedDispatcher(concurrency=2)
+        running = []
+        peak = []
+
+        async def job():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.pop()
+
+        await asyncio.gather(*[dispatcher.submit(f"req-{i}", job) for i in range(4)])
+        assert max(peak) == 2
+
+    async def test_failing_job_does_not_block_key(self):
+        """An exception in one job does not prevent later jobs of the same key."""
+        dispatcher = OrderedDispatcher(concurrency=1)
+        seen = []
+
+        async def boom():
+            raise RuntimeError("boom")
+
+        async def ok():
+            seen.append("ok")
+
+        await asyncio.gather(dispatcher.submit("req", boom), dispatcher.submit("req", ok))
+        assert seen == ["ok"]
@@ -0,0 +1,68 @@
+"""Tests for per-project budgets and loop detection."""
+
+import budget
+from budget import LIMITS, exceeded, is_repeat
+
+NOW = 10_000.0
+
+
+def state(**fields):
+    return {"started_at": str(NOW - 10), **{k: str(v) for k, v in fields.items()}}
+
+
+class TestBudget:
+    """Tests for the limit checks enforced by the manager."""
+
+    def test_within_budget(self):
+        """A young project under every limit keeps going."""
+        assert exceeded(state(**{"rounds:coder": 2, "model_calls": 5}), now=NOW) is None
+
+    def test_rounds_per_stage(self):
+        """Too many rounds of one role stop the project."""
+        fields = {"rounds:coder": LIMITS["rounds"] + 1}
+        assert "coder ran" in exceeded(state(**fields), now=NOW)
+
+    def test_model_calls_and_tokens(self):
+        """Model calls and output tokens are capped per project."""
+        calls = state(model_calls=LIMITS["model_calls"] + 1)
+        assert "model calls" in exceeded(calls, now=NOW)
+        assert "tokens" in exceeded(state(tokens=LIMITS["tokens"] + 1), now=NOW)
+
+    def test_model_failures(self):
+        """Failures beyond the retry budget stop the project."""
+        assert exceeded(state(errors=LIMITS["errors"]), now=NOW) is None
+        assert "model failures" in exceeded(state(errors=LIMITS["errors"] + 1), now=NOW)
+
+    def test_deadline(self):
+        """Projects past the wall-clock deadline are stopped."""
+        late = {"started_at": str(NOW - LIMITS["deadline"] - 1)}
+        assert "running for" in exceeded(late, now=NOW)
+
+    def test_repeated_outputs(self):
+        """Consecutive near-identical outputs trip the loop detector."""
+        fields = {"repeats:reviewer": LIMITS["repeats"]}
+        assert "reviewer repeated" in exceeded(state(**fields), now=NOW)
+
+    def test_is_repeat(self):
+        """Identical and almost identical texts repeat; different ones do not."""
+        code = "def run():\n    print('ok')\n" * 20
+        assert not is_repeat(None, code, 0.95)
+        assert is_repeat(code, code, 0.95)
+        assert is_repeat(code, code.replace("ok", "OK", 1), 0.95)
+        assert not is_repeat(code, "- Add error handling in run().", 0.95)
+
+
+class TestRecordOutput:
+    """Tests for the counters kept per project."""
+
+    def test_fanout_join_is_not_counted_twice(self, fake_redis, monkeypatch):
+        """Parts count their calls and tokens; the join only adds a round."""
+        monkeypatch.setattr(budget, "r", fake_redis)
+        for _ in range(2):
+            budget.record_output("p1", "coder", "x" * 400, rounds=0)
+        state = budget.record_output(
+            "p1", "coder", "x" * 800, rounds=1, model_calls=0, tokens=False
+        )
+        assert state["tokens"] == "200"
+        assert state["model_calls"] == "2"
+        assert state["rounds:coder"] == "1"
@@ -0,0 +1,63 @@
+"""Tests for model call recording and replay."""
+
+import pytest
+
+from cassette import CassetteMiss, RecordingModelFactory, ReplayModelFactory
+from fake_llm import FakeModelFactory
+from llm_client import LLMClient, load_model_factory
+
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    """Cassette with two reviewer answers and one streamed coder answer."""
+    monkeypatch.setenv("FAKE_LLM_LATENCY_SCALE", "0")
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = RecordingModelFactory(path, FakeModelFactory())
+    model = recorder("smart")
+    model.generate_content("TASK FOR REVIEWER: v1")
+    model.generate_content("TASK FOR REVIEWER: v2")
+    list(model.generate_content("TASK FOR CODER: go", stream=True))
+    return path
+
+
+class TestCassette:
+    """Tests for record and replay modes."""
+
+    def test_replay_by_prompt_hash(self, recorded):
+        """A recorded prompt gets its own answer, even out of order."""
+        model = ReplayModelFactory(recorded)("smart")
+        assert model.generate_content("TASK FOR REVIEWER: v2").text == "VALIDATED"
+        assert model.generate_content("TASK FOR REVIEWER: v1").text.startswith("- Add error")
+
+    def test_streamed_answer_is_replayed_in_chunks(self, recorded):
+        """Streamed recordings keep the full text and token counts."""
+        factory = ReplayModelFactory(recorded)
+        chunks = list(factory("smart").generate_content("TASK FOR CODER: go", stream=True))
+        assert "# Nom du fichier: main.py" in "".join(c.text for c in chunks)
+        assert chunks[-1].usage_metadata.candidates_token_count > 0
+
+    def test_changed_prompt_falls_back_to_same_role(self, recorded):
+        """An unknown prompt gets the next unused answer of the same role."""
+        factory = ReplayModelFactory(recorded)
+        model = factory("smart")
+        assert model.generate_content("TASK FOR REVIEWER: v1").text.startswith("- Add error")
+        assert model.generate_content("TASK FOR REVIEWER: changed").text == "VALIDATED"
+        assert factory.stats == {"hit": 1, "fallback": 1}
+
+    def test_repeat_and_miss(self, recorded):
+        """A prompt replayed twice gets the same answer; nothing left raises CassetteMiss."""
+        factory = ReplayModelFactory(recorded)
+        model = factory("smart")
+        first = model.generate_content("TASK FOR CODER: go").text
+        assert model.generate_content("TASK FOR CODER: go").text == first
+        with pytest.raises(CassetteMiss):
+            model.generate_content("TASK FOR CODER: other")
+        with pytest.raises(CassetteMiss):
+            factory("fast").generate_content("TASK FOR REVIEWER: v1")
+
+    def test_llm_client_replay_provider(self, recorded):
+        """LLM_PROVIDER=replay:<path> serves the cassette through LLMClient."""
+        client = LLMClient(max_in_flight=1, model_factory=load_model_factory(f"replay:{recorded}"))
+        assert client.generate("smart", "TASK FOR REVIEWER: v2", role="reviewer") == "VALIDATED"
+        timed = load_model_factory(f"replay:{recorded}:timed")
+        assert timed.timed
@@ -0,0 +1,92 @@
+"""Tests for token-budgeted context assembly."""
+
+from context_budget import (
+    compression_budget,
+    drop_replaced_parts,
+    elide_code_blocks,
+    estimate_tokens,
+    fit_tail,
+    get_context_budget,
+    split_for_compression,
+    tail_budget,
+)
+
+
+def render(data):
+    return f"[{data['sender'].upper()}]: {data['content']}"
+
+
+def entry(i, content, sender="manager"):
+    return (f"{i}-0", {"sender": sender, "content": content})
+
+
+BIG_CODE = "```python\n# Nom du fichier: main.py\n" + "print('x')\n" * 200 + "```"
+
+
+class TestContextBudget:
+    """Tests for budgets, elision and tail selection."""
+
+    def test_budget_per_role(self, monkeypatch):
+        """CONTEXT_BUDGET_<ROLE> overrides CONTEXT_BUDGET."""
+        monkeypatch.setenv("CONTEXT_BUDGET", "1000")
+        monkeypatch.setenv("CONTEXT_BUDGET_CODER", "3000")
+        assert get_context_budget("coder") == 3000
+        assert get_context_budget("reviewer") == 1000
+        assert get_context_budget() == 1000
+
+    def test_large_code_block_is_elided_with_reference(self):
+        """Big blocks become a reference; small ones are kept."""
+        text = elide_code_blocks(f"Here:\n{BIG_CODE}\n```\nx = 1\n```", "42-0")
+        assert "[main.py: 201 lines elided, see entry 42-0]" in text
+        assert "x = 1" in text
+
+    def test_tail_fits_budget_and_reports_overflow(self):
+        """Newest entries are kept while they fit; older ones overflow."""
+        entries = [entry(i, "m" * 400) for i in range(10)]
+        overflow, lines = fit_tail(entries, 350, render)
+        assert sum(estimate_tokens(line) for line in lines) <= 350
+        assert overflow == entries[: len(entries) - len(lines)]
+        assert lines[-1] == render(entries[-1][1])
+
+    def test_old_code_is_elided_before_being_dropped(self):
+        """An older message with a big block stays, minus its code."""
+        entries = [entry(1, BIG_CODE, "coder"), entry(2, "- fix it", "reviewer")]
+        overflow, lines = fit_tail(entries, 100, render)
+        assert overflow == []
+        assert "lines elided, see entry 1-0" in lines[0]
+
+    def test_newest_entry_is_truncated_if_needed(self):
+        """The latest message is always present, cut to the budget."""
+        _, lines = fit_tail([entry(1, "z" * 4000)], 100, render)
+        assert len(lines) == 1
+        assert estimate_tokens(lines[0]) <= 100
+        assert lines[0].endswith("[... truncated]")
+
+    def test_split_for_compression(self):
+        """Nothing is compressed within budget; beyond, half the budget is kept."""
+        entries = [entry(i, "m" * 389) for i in range(10)]  # 100 tokens each
+        assert split_for_compression(entries, 1000, render) == ([], entries)
+        to_compress, to_keep = split_for_compression(entries, 800, render)
+        assert to_compress + to_keep == entries
+        assert len(to_keep) == 4
+
+    def test_compression_budget_uses_smallest_role_and_summary(self, monkeypatch):
+        """The summarizer budget is the smallest role budget minus the summary."""
+        monkeypatch.setenv("CONTEXT_BUDGET", "1000")
+        monkeypatch.setenv("CONTEXT_BUDGET_MANAGER", "800")
+        summary = "s" * 2000
+        assert tail_budget(1000, summary) == 500
+        assert compression_budget(("manager", "coder"), summary) == 300
+        assert compression_budget(("coder",), "s" * 8000) == 250
+
+    def test_drop_replaced_parts(self):
+        """Fan-out parts before the joined code are dropped; later ones stay."""
+        entries = [
+            ("1-0", {"type": "code_part"}),
+            ("2-0", {"type": "code"}),
+            ("3-0", {"type": "data"}),
+            ("4-0", {"type": "code_part"}),
+        ]
+        kept = [entry_id for entry_id, _ in drop_replaced_parts(entries)]
+        assert kept == ["2-0", "3-0", "4-0"]
+        assert drop_replaced_parts(entries[:1]) == entries[:1]
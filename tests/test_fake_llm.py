@@ -0,0 +1,60 @@
+"""Tests for the simulated model backend used by the benchmark."""
+
+import json
+
+import pytest
+
+from fake_llm import FakeModelFactory, detect_role
+from llm_client import LLMClient, load_model_factory
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    # The built-in per-role latencies (coder 8 s, ...) would apply otherwise
+    monkeypatch.setenv("FAKE_LLM_LATENCY_SCALE", "0")
+    path = tmp_path / "fake.json"
+    path.write_text(
+        json.dumps(
+            {
+                "responses": {"reviewer": ["fix it", "VALIDATED"]},
+            }
+        )
+    )
+    return str(path)
+
+
+class TestFakeLLM:
+    """Tests for role detection, scripted answers and latency."""
+
+    def test_detect_role(self):
+        """The role comes from the agent prompt or the compression instruction."""
+        assert detect_role("SYSTEM: ...\nTASK FOR REVIEWER: check") == "reviewer"
+        assert detect_role("TASK: Compress logs into key facts.") == "summarizer"
+        assert detect_role("hello") == "default"
+
+    def test_scripted_responses_cycle(self, config_path):
+        """Scripted answers are served in order, then start over."""
+        model = FakeModelFactory(config_path)("fake-smart")
+        answers = [model.generate_content("TASK FOR REVIEWER: go").text for _ in range(3)]
+        assert answers == ["fix it", "VALIDATED", "fix it"]
+
+    def test_latency_scale(self, config_path, monkeypatch):
+        """Sampled latencies are multiplied by FAKE_LLM_LATENCY_SCALE."""
+        monkeypatch.setenv("FAKE_LLM_LATENCY_SCALE", "0.5")
+        factory = FakeModelFactory(config_path)
+        factory.config["latency"]["coder"] = {"dist": "fixed", "value": 4.0}
+        assert factory.sample_latency("coder") == 2.0
+
+    def test_stream_reports_usage_on_last_chunk(self, config_path):
+        """Streamed text matches the answer; usage comes with the last chunk."""
+        factory = FakeModelFactory(config_path)
+        factory.scripts["coder"] = iter(["x" * 200])
+        chunks = list(factory("m").generate_content("TASK FOR CODER: go", stream=True))
+        assert "".join(c.text for c in chunks) == "x" * 200
+        assert chunks[-1].usage_metadata.candidates_token_count == 50
+        assert all(c.usage_metadata is None for c in chunks[:-1])
+
+    def test_llm_client_with_fake_provider(self, config_path):
+        """LLM_PROVIDER=fake:<config> plugs the simulator into LLMClient."""
+        client = LLMClient(max_in_flight=1, model_factory=load_model_factory(f"fake:{config_path}"))
+        assert client.generate("m", "TASK FOR REVIEWER: go", role="reviewer") == "fix it"
@@ -0,0 +1,56 @@
+"""Tests for the per-file coder fan-out."""
+
+from fanout import extract_code, merge_parts, parse_plan_files, part_instruction
+
+PLAN = """```
+project/
+├── main.py
+├── app/
+│   ├── __init__.py
+│   └── core.py
+└── requirements.txt
+```
+Stack: Python 3.11"""
+
+
+class TestFanout:
+    """Tests for plan parsing and joining of file parts."""
+
+    def test_parse_tree(self):
+        """Nested tree entries give full relative paths; directories are skipped."""
+        assert parse_plan_files(PLAN) == [
+            "main.py",
+            "app/__init__.py",
+            "app/core.py",
+            "requirements.txt",
+        ]
+
+    def test_parse_explicit_paths_without_tree(self):
+        """Without a tree, file paths quoted in the plan are used once each."""
+        plan = "- `src/cli.py`: entry point\n- `src/io.py` reads files; cli.py calls it"
+        assert parse_plan_files(plan) == ["src/cli.py", "src/io.py"]
+
+    def test_bare_names_are_kept_when_not_nested(self):
+        """Top-level files mentioned by name are still planned."""
+        plan = "Files: main.py and utils/io.py; main.py imports io."
+        assert parse_plan_files(plan) == ["main.py", "utils/io.py"]
+
+    def test_instruction_names_the_file(self):
+        """Each task is addressed to the coder and names its file."""
+        text = part_instruction("app/core.py", 2, 4)
+        assert text.startswith("@Coder")
+        assert "`app/core.py` (2/4)" in text
+        assert "# Nom du fichier: app/core.py" in text
+
+    def test_merge_in_plan_order(self):
+        """Parts are unwrapped, then rejoined with one named block per file."""
+        parts = {
+            "b.txt": "requests",
+            "a.py": "```python\n# Nom du fichier: a.py\nprint('a')\n```",
+        }
+        assert extract_code(parts["a.py"]) == "print('a')"
+        merged = merge_parts(["a.py", "b.txt"], parts)
+        assert merged == (
+            "```python\n# Nom du fichier: a.py\nprint('a')\n```\n\n"
+            "```\n# Nom du fichier: b.txt\nrequests\n```"
+        )
@@ -0,0 +1,78 @@
+"""Tests for the shared LLM client layer."""
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from llm_client import LLMClient, LLMError
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Model stub failing with the given errors before answering."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        if stream:
+            return [FakeResponse("echo: "), FakeResponse(prompt)]
+        return FakeResponse(f"echo: {prompt}")
+
+
+def make_client(model, max_retries=3):
+    client = LLMClient(max_in_flight=2, max_retries=max_retries, backoff_base=0.001)
+    client.models["fake"] = model
+    return client
+
+
+class TestLLMClient:
+    """Tests for retries and typed errors."""
+
+    def test_model_handle_is_reused(self):
+        """The same model handle is returned for every call."""
+        client = make_client(FakeModel([]))
+        assert client.get_model("fake") is client.get_model("fake")
+
+    def test_transient_errors_are_retried(self):
+        """Quota and availability errors are retried until success."""
+        model = FakeModel(
+            [google_exceptions.ServiceUnavailable("down"), google_exceptions.TooManyRequests("429")]
+        )
+        assert make_client(model).generate("fake", "hi") == "echo: hi"
+        assert model.calls == 3
+
+    def test_retries_exhausted_raise_llm_error(self):
+        """A transient error that persists becomes a typed LLMError."""
+        model = FakeModel([google_exceptions.ServiceUnavailable("down")] * 5)
+        with pytest.raises(LLMError) as exc:
+            make_client(model, max_retries=2).generate("fake", "hi")
+        assert exc.value.transient
+        assert model.calls == 3
+
+    def test_hard_errors_are_not_retried(self):
+        """Non-transient failures are raised immediately."""
+        model = FakeModel([ValueError("blocked by safety filters")])
+        with pytest.raises(LLMError) as exc:
+            make_client(model).generate("fake", "hi")
+        assert not exc.value.transient
+        assert model.calls == 1
+
+    def test_backoff_is_bounded(self):
+        """Jittered delays never exceed the configured maximum."""
+        client = LLMClient(backoff_base=1.0, backoff_max=5.0)
+        assert all(0 <= client.backoff_delay(attempt) <= 5.0 for attempt in range(10))
+
+    def test_streaming_emits_chunks(self):
+        """With on_chunk, fragments are forwarded as they arrive and joined at the end."""
+        chunks = []
+        text = make_client(FakeModel([])).generate("fake", "hi", on_chunk=chunks.append)
+        assert chunks == ["echo: ", "hi"]
+        assert text == "echo: hi"
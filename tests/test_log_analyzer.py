@@ -0,0 +1,68 @@
+"""Tests for the offline project log analyzer."""
+
+import io
+import json
+
+from log_analyzer import analyze, analyze_project, percentile
+
+
+def write_log(path, events):
+    with open(path, "w", encoding="utf-8") as f:
+        for seq, (second, sender, content) in enumerate(events, start=1):
+            entry = {
+                "timestamp": f"2025-12-18T14:00:{second:02d}",
+                "sequence": seq,
+                "sender": sender,
+                "type": "cmd" if sender == "manager" else "data",
+                "status": "DONE",
+                "content": content,
+            }
+            f.write(json.dumps(entry) + "\n")
+
+
+EVENTS = [
+    (0, "manager", "@Analyst EXECUTE"),
+    (10, "analyst", "specs"),
+    (12, "manager", "@Coder go"),
+    (40, "coder", "code"),
+    (41, "manager", "@Reviewer audit"),
+    (46, "reviewer", "- fix bug"),
+    (47, "manager", "@Coder fix"),
+    (57, "coder", "code v2"),
+    (58, "manager", "@Reviewer audit"),
+    (59, "reviewer", "VALIDATED"),
+]
+
+
+class TestLogAnalyzer:
+    """Tests for timeline reconstruction and reporting."""
+
+    def test_time_is_attributed_to_responding_stage(self, tmp_path):
+        """Each gap is charged to the role (or routing) that produced the next message."""
+        path = tmp_path / "project_abc.jsonl"
+        write_log(path, EVENTS)
+        stats = analyze_project(str(path))
+        assert stats["project"] == "abc"
+        assert stats["wall_seconds"] == 59
+        assert stats["stages"]["coder"] == {"count": 2, "seconds": 38.0}
+        assert stats["stages"]["routing"]["count"] == 4
+        assert stats["review_loops"] == 1
+
+    def test_report_and_trace(self, tmp_path):
+        """The report lists percentiles per stage and the trace is valid JSON."""
+        path = tmp_path / "project_abc.jsonl"
+        write_log(path, EVENTS)
+        trace_path = tmp_path / "trace.json"
+        out = io.StringIO()
+        durations = analyze([str(tmp_path)], str(trace_path), out=out)
+        assert sorted(durations["coder"]) == [10.0, 28.0]
+        assert "coder" in out.getvalue()
+        events = json.loads(trace_path.read_text(encoding="utf-8"))["traceEvents"]
+        assert len([e for e in events if e["ph"] == "X"]) == len(EVENTS) - 1
+
+    def test_percentile_interpolates(self):
+        """Percentiles interpolate between the closest ranks."""
+        values = [1.0, 2.0, 3.0, 4.0]
+        assert percentile(values, 50) == 2.5
+        assert percentile(values, 100) == 4.0
+        assert percentile([], 95) == 0.0
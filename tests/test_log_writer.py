@@ -0,0 +1,37 @@
+"""Tests for the background project log writer."""
+
+import json
+
+from log_writer import LogWriter
+
+
+class TestLogWriter:
+    """Tests for batching, handle eviction and shutdown draining."""
+
+    def test_shutdown_drains_queue(self, tmp_path):
+        """Every queued entry is on disk once shutdown returns."""
+        writer = LogWriter(log_dir=str(tmp_path), flush_interval=60)
+        for seq in range(50):
+            writer.write("req-1", {"sequence": seq})
+        writer.shutdown()
+        lines = (tmp_path / "project_req-1.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["sequence"] for line in lines] == list(range(50))
+
+    def test_open_handles_are_bounded(self, tmp_path):
+        """Least recently used project files are closed beyond the limit."""
+        writer = LogWriter(log_dir=str(tmp_path), max_open_files=2, flush_interval=60)
+        for request_id in ["a", "b", "c", "a"]:
+            writer.write(request_id, {"sender": request_id})
+        writer.shutdown()
+        assert len(writer.handles) == 0
+        assert (tmp_path / "project_a.jsonl").read_text(encoding="utf-8").count("\n") == 2
+        assert (tmp_path / "project_c.jsonl").exists()
+
+    def test_close_project_releases_handle(self, tmp_path):
+        """Closing a finished project flushes and drops its file handle."""
+        writer = LogWriter(log_dir=str(tmp_path), flush_interval=60)
+        writer.write("done", {"type": "end"})
+        writer.close_project("done")
+        writer.write("other", {"type": "cmd"})
+        writer.shutdown()
+        assert "end" in (tmp_path / "project_done.jsonl").read_text(encoding="utf-8")
@@ -0,0 +1,54 @@
+"""Tests for the Prometheus-style metrics registry."""
+
+import socket
+import time
+
+from metrics import Counter, Histogram, entry_age, start_metrics_server
+
+
+class TestMetrics:
+    """Tests for metric rendering."""
+
+    def test_counter_renders_labels(self):
+        """Counters are rendered with their labels and HELP/TYPE headers."""
+        counter = Counter("test_messages_total", "Messages", ("sender",))
+        counter.inc(sender="coder")
+        counter.inc(2, sender="coder")
+        lines = counter.render()
+        assert lines[:2] == [
+            "# HELP test_messages_total Messages",
+            "# TYPE test_messages_total counter",
+        ]
+        assert 'test_messages_total{sender="coder"} 3' in lines
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Each bucket counts observations less than or equal to its bound."""
+        histogram = Histogram("test_seconds", "Latency", ("role",), buckets=(0.1, 1))
+        histogram.observe(0.05, role="coder")
+        histogram.observe(0.5, role="coder")
+        lines = histogram.render()
+        assert 'test_seconds_bucket{role="coder",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{role="coder",le="1"} 2' in lines
+        assert 'test_seconds_bucket{role="coder",le="+Inf"} 2' in lines
+        assert 'test_seconds_count{role="coder"} 2' in lines
+
+    def test_entry_age_from_stream_id(self):
+        """Queue wait is derived from the millisecond timestamp of a stream ID."""
+        entry_id = f"{int((time.time() - 2) * 1000)}-0"
+        assert 1.5 < entry_age(entry_id) < 5
+        assert entry_age("not-an-id") == 0.0
+
+    def test_busy_port_does_not_stop_the_process(self):
+        """A second process on the same port runs without a metrics server."""
+        server = start_metrics_server(_free_port())
+        try:
+            assert start_metrics_server(server.server_address[1]) is None
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,79 @@
+"""Tests for the content-addressed payload store."""
+
+import zlib
+
+from payload_store import PREVIEW_CHARS, PayloadStore
+
+
+class DictRedis:
+    """Minimal byte-valued Redis stand-in (SET NX, EXPIRE, MGET)."""
+
+    def __init__(self):
+        self.data = {}
+        self.writes = 0
+        self.mgets = 0
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return
+        self.writes += 1
+        self.data[key] = value
+
+    def expire(self, key, ttl):
+        pass
+
+    def execute(self):
+        pass
+
+    def mget(self, keys):
+        self.mgets += 1
+        return [self.data.get(key) for key in keys]
+
+
+def message(content):
+    return {"request_id": "p1", "sender": "coder", "content": content, "type": "message"}
+
+
+class TestPayloadStore:
+    """Tests for offloading and fetching large contents."""
+
+    def test_small_message_is_untouched(self):
+        """Contents under the threshold stay inline."""
+        store = PayloadStore(DictRedis(), threshold=100)
+        assert store.offload(message("short")) == message("short")
+
+    def test_large_message_is_replaced_by_reference(self):
+        """The entry keeps hash, size and preview; the body is stored compressed."""
+        client = DictRedis()
+        store = PayloadStore(client, threshold=100)
+        body = "print('x')\n" * 50
+        stored = store.offload(message(body))
+        assert "content" not in stored
+        assert stored["size"] == len(body)
+        assert stored["preview"] == body[:PREVIEW_CHARS]
+        raw = client.data[f"payload:{stored['payload']}"]
+        assert zlib.decompress(raw).decode("utf-8") == body
+
+    def test_identical_content_is_stored_once(self):
+        """Repeated bodies share one key."""
+        client = DictRedis()
+        store = PayloadStore(client, threshold=10)
+        first = store.offload(message("same content " * 10))
+        second = store.offload(message("same content " * 10))
+        assert first["payload"] == second["payload"]
+        assert client.writes == 1
+
+    def test_get_many_uses_local_cache_then_redis(self):
+        """Bodies written by another process are fetched in one MGET, then cached."""
+        client = DictRedis()
+        writer = PayloadStore(client, threshold=10)
+        digests = [writer.offload(message(f"body {i} " * 10))["payload"] for i in range(3)]
+        reader = PayloadStore(client, threshold=10)
+        bodies = reader.get_many(digests + ["unknown"])
+        assert bodies == {d: f"body {i} " * 10 for i, d in enumerate(digests)}
+        assert client.mgets == 1
+        assert reader.get(digests[0]) == "body 0 " * 10
+        assert client.mgets == 1
@@ -0,0 +1,102 @@
+"""Tests for project message publishing."""
+
+import utils
+from utils import STREAM_KEY, _prepare_message, _publish_args
+
+
+def index_fields(sender, msg_type, status="DONE"):
+    message = _prepare_message(sender, "body", msg_type, "p1", status, None)
+    _keys, args = _publish_args(message)
+    return args[3].split()
+
+
+class TestPublishArgs:
+    """Tests for the arguments passed to the publish script."""
+
+    def test_done_entries_update_role_and_artifact_aliases(self):
+        """A coder delivery becomes both the latest coder entry and the latest code."""
+        assert index_fields("coder", "code") == ["coder", "code"]
+        assert index_fields("reviewer", "data") == ["reviewer"]
+
+    def test_code_parts_and_errors_leave_the_index_alone(self):
+        """A single fan-out file or a failed call never replaces the current code."""
+        assert index_fields("coder", "code_part") == []
+        assert index_fields("coder", "error", status="ERROR") == []
+
+
+class TestPublishScript:
+    """Tests for the atomic write done by the publish script."""
+
+    def test_sequence_follows_stream_order(self, fake_redis):
+        """Sequences increase with the project stream and notices point to their entry."""
+        for i in range(3):
+            utils.publish_message("analyst", f"spec {i}", "data", "p1")
+        entries = fake_redis.xrange(utils.project_stream_key("p1"))
+        assert [data["sequence_id"] for _, data in entries] == ["1", "2", "3"]
+        notices = fake_redis.xrange(STREAM_KEY)
+        assert [data["ref"] for _, data in notices] == [entry_id for entry_id, _ in entries]
+
+    def test_notice_carries_content_only_for_control_types(self, fake_redis):
+        """Agent outputs stay in the project stream; commands travel inline."""
+        utils.publish_message("coder", "print('x')", "code", "p1")
+        utils.publish_message("manager", "@Reviewer Audit", "cmd", "p1")
+        (_, output), (_, command) = fake_redis.xrange(STREAM_KEY)
+        assert "content" not in output
+        assert output["type"] == "code"
+        assert command["content"] == "@Reviewer Audit"
+
+    def test_latest_index_aliases(self, fake_redis):
+        """DONE deliveries repoint the role and artifact aliases; parts and errors do not."""
+        utils.publish_message("coder", "v1", "code", "p1")
+        utils.publish_message("coder", "one file", "code_part", "p1", fields={"file": "a.py"})
+        utils.publish_message("coder", "AI ERROR", "error", "p1", status="ERROR")
+        assert utils.get_latest_content("p1", "code") == "v1"
+        assert utils.get_latest_content("p1", "coder") == "v1"
+        assert utils.get_latest_entry("p1", "spec") is None
+
+    def test_inbox_delivery(self, fake_redis):
+        """A command with an inbox is also delivered to that role only."""
+        utils.publish_message("manager", "@Coder Write", "cmd", "p1", inbox="coder")
+        utils.publish_message("manager", "@Reviewer Audit", "cmd", "p1")
+        ((_, notice),) = fake_redis.xrange(utils.inbox_key("coder"))
+        assert notice["content"] == "@Coder Write"
+        assert notice["ref"] == fake_redis.xrange(utils.project_stream_key("p1"))[0][0]
+        assert not fake_redis.exists(utils.inbox_key("reviewer"))
+
+    def test_large_content_is_resolved_from_payload_store(self, fake_redis):
+        """An offloaded body is read back through the payload reference."""
+        body = "x = 1\n" * 50
+        utils.publish_message("coder", body, "code", "p1")
+        ((_, entry),) = fake_redis.xrange(utils.project_stream_key("p1"))
+        assert "content" not in entry
+        assert utils.get_latest_content("p1", "code") == body
+
+
+class TestSmartContext:
+    """Tests for the context given to agents on a project."""
+
+    def test_coder_fix_round_sees_current_code_in_full(self, fake_redis, monkeypatch):
+        """The joined code is never elided; the parts it replaced are left out."""
+        monkeypatch.setenv("CONTEXT_BUDGET", "2000")
+        body = "print('line')\n" * 800
+        stale = "```python\n# Nom du fichier: helpers.py\nSTALE = True\n```"
+        joined = "\n".join(
+            f"```python\n# Nom du fichier: {name}\n{body}```" for name in ("main.py", "helpers.py")
+        )
+        utils.publish_message("coder", stale, "code_part", "p1", fields={"file": "helpers.py"})
+        utils.publish_message("coder", joined, "code", "p1", fields={"fanout": "joined"})
+        utils.publish_message("reviewer", "- fix helpers", "data", "p1")
+        context = utils.build_smart_context("p1", "coder")
+        assert joined in context
+        assert "elided" not in context
+        assert "STALE" not in context
+        assert "- fix helpers" in context
+
+    def test_other_roles_keep_the_budgeted_tail(self, fake_redis, monkeypatch):
+        """Without a pinned copy, large code in the tail is still elided."""
+        monkeypatch.setenv("CONTEXT_BUDGET", "300")
+        code = "```python\n# Nom du fichier: main.py\n" + "print('x')\n" * 300 + "```"
+        utils.publish_message("coder", code, "code", "p1")
+        utils.publish_message("reviewer", "- fix main", "data", "p1")
+        context = utils.build_smart_context("p1", "architect")
+        assert "[main.py: 301 lines elided" in context
@@ -0,0 +1,47 @@
+"""Tests for the model response cache."""
+
+from response_cache import ResponseCache, get_cache_ttl
+
+
+class TestResponseCache:
+    """Tests for the in-process LRU tier."""
+
+    def test_key_depends_on_model_and_prompt(self):
+        """Same prompt on another model must not share a cache entry."""
+        key = ResponseCache.make_key("gemini-2.5-pro", "prompt")
+        assert key == ResponseCache.make_key("gemini-2.5-pro", "prompt")
+        assert key != ResponseCache.make_key("gemini-2.5-flash", "prompt")
+
+    def test_hit_and_miss_counters(self):
+        """Lookups update the hit/miss counters."""
+        cache = ResponseCache(max_local=4)
+        assert cache.get("k") is None
+        cache.set("k", "value", ttl=60)
+        assert cache.get("k") == "value"
+        assert cache.stats == {"local_hits": 1, "redis_hits": 0, "misses": 1}
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = ResponseCache(max_local=2)
+        cache.set("a", "1", ttl=60)
+        cache.set("b", "2", ttl=60)
+        cache.get("a")
+        cache.set("c", "3", ttl=60)
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+
+    def test_expired_entry_is_a_miss(self):
+        """Entries past their TTL are not served."""
+        cache = ResponseCache(max_local=2)
+        cache.set("a", "1", ttl=60)
+        cache.local["a"] = (0, "1")
+        assert cache.get("a") is None
+
+    def test_zero_ttl_disables_cache(self, monkeypatch):
+        """A per-role TTL of 0 turns caching off for that role."""
+        monkeypatch.setenv("CACHE_TTL_CODER", "0")
+        assert get_cache_ttl("coder") == 0
+        cache = ResponseCache(max_local=2)
+        cache.set("a", "1", ttl=get_cache_ttl("coder"))
+        assert cache.get("a") is None
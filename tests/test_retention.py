@@ -0,0 +1,61 @@
+"""Tests for project expiry and archiving."""
+
+import gzip
+import json
+import time
+
+import retention
+import utils
+
+
+def publish_project(request_id):
+    utils.publish_message("analyst", "specs", "data", request_id)
+    utils.publish_message("coder", "print('x')\n" * 20, "code", request_id)
+
+
+class TestExpireProject:
+    """Tests for the end-of-project TTLs."""
+
+    def test_every_project_key_gets_a_ttl(self, fake_redis):
+        """All project:{id}:* keys expire and the project is queued for archiving."""
+        publish_project("p1")
+        for suffix in utils.PROJECT_KEY_SUFFIXES:
+            # Keys the messages did not create (summary, budget, ...)
+            if not fake_redis.exists(f"project:p1:{suffix}"):
+                fake_redis.set(f"project:p1:{suffix}", "x")
+        utils.expire_project("p1")
+        for suffix in utils.PROJECT_KEY_SUFFIXES:
+            assert 0 < fake_redis.ttl(f"project:p1:{suffix}") <= utils.PROJECT_TTL, suffix
+        assert fake_redis.zscore(utils.FINISHED_PROJECTS_KEY, "p1") is not None
+
+
+class TestArchive:
+    """Tests for moving finished streams to gzip files."""
+
+    def test_archive_project(self, fake_redis, monkeypatch, tmp_path):
+        """Entries (offloaded bodies included) are written, then the stream is deleted."""
+        monkeypatch.setattr(retention, "r", fake_redis)
+        publish_project("p1")
+        utils.expire_project("p1")
+        assert retention.archive_project("p1", archive_dir=str(tmp_path)) == 2
+        with gzip.open(tmp_path / "project_p1.jsonl.gz", "rt", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["sender"] for line in lines] == ["analyst", "coder"]
+        assert lines[1]["content"] == "print('x')\n" * 20
+        assert all(line["id"] for line in lines)
+        assert not fake_redis.exists(utils.project_stream_key("p1"))
+        assert fake_redis.zscore(utils.FINISHED_PROJECTS_KEY, "p1") is None
+
+    def test_only_due_projects_are_archived(self, fake_redis, monkeypatch, tmp_path):
+        """Projects finished less than ARCHIVE_DELAY ago stay in Redis."""
+        monkeypatch.setattr(retention, "r", fake_redis)
+        monkeypatch.chdir(tmp_path)
+        publish_project("old")
+        publish_project("new")
+        fake_redis.zadd(
+            utils.FINISHED_PROJECTS_KEY, {"old": time.time() - 1000, "new": time.time()}
+        )
+        assert retention.archive_due_projects(delay=600) == ["old"]
+        assert (tmp_path / "archive" / "project_old.jsonl.gz").exists()
+        assert fake_redis.exists(utils.project_stream_key("new"))
+        assert fake_redis.zscore(utils.FINISHED_PROJECTS_KEY, "new") is not None
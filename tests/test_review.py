@@ -0,0 +1,30 @@
+"""Tests for diff-based incremental review."""
+
+from review import review_input
+
+CODE = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(40))
+
+
+class TestReviewInput:
+    """Tests for choosing between a full review and a diff."""
+
+    def test_first_review_is_full(self):
+        """Without a reviewed version, the whole code is sent."""
+        assert review_input(None, None, CODE) == ("full", CODE)
+
+    def test_small_fix_is_sent_as_diff(self):
+        """A small change yields a unified diff of the touched lines only."""
+        fixed = CODE.replace("return 7\n", "return 7  # fixed\n")
+        mode, diff = review_input(CODE, "- f7 is wrong", fixed)
+        assert mode == "diff"
+        assert "-    return 7\n+    return 7  # fixed\n" in diff
+        assert "return 30" not in diff
+
+    def test_large_rewrite_falls_back_to_full(self):
+        """A diff bigger than the threshold triggers a full review."""
+        rewritten = CODE.replace("return", "yield")
+        assert review_input(CODE, "- use generators", rewritten) == ("full", rewritten)
+
+    def test_unchanged_code(self):
+        """Resubmitting the same code is reported explicitly."""
+        assert review_input(CODE, "- f7 is wrong", CODE) == ("diff", "(no changes)")
@@ -0,0 +1,60 @@
+"""Tests for the background summarizer."""
+
+from summarizer import Scheduler, summarize_project
+
+
+class RecordingPool:
+    """Pool stub that keeps submitted tasks until run() is called."""
+
+    def __init__(self):
+        self.tasks = []
+
+    def submit(self, key, fn, *args):
+        self.tasks.append((key, fn, args))
+
+    def queue_depth(self):
+        return len(self.tasks)
+
+
+class TestScheduler:
+    """Tests for per-project deduplication."""
+
+    def test_one_pending_task_per_project(self):
+        """Activity on a project already waiting does not queue another pass."""
+        pool = RecordingPool()
+        scheduler = Scheduler(pool)
+        scheduler.touch("a")
+        scheduler.touch("a")
+        scheduler.touch("b")
+        assert [key for key, _, _ in pool.tasks] == ["a", "b"]
+
+    def test_project_can_be_rescheduled_once_started(self, monkeypatch):
+        """New activity after a pass has started schedules a new pass."""
+        monkeypatch.setattr("summarizer.summarize_project", lambda request_id: False)
+        pool = RecordingPool()
+        scheduler = Scheduler(pool)
+        scheduler.touch("a")
+        _, fn, args = pool.tasks.pop()
+        fn(*args)
+        scheduler.touch("a")
+        assert len(pool.tasks) == 1
+
+
+class TestSummarizeProject:
+    """Tests for the compression trigger."""
+
+    def test_triggers_on_prompt_tail_budget(self, monkeypatch):
+        """Entries dropped from prompts by a large summary are compressed."""
+        monkeypatch.setenv("CONTEXT_BUDGET", "1000")
+        entries = [(f"{i}-0", {"sender": "coder", "content": "x" * 389}) for i in range(9)]
+        summary = {"text": "s" * 2000, "version": "1", "upto": "0-0"}
+        committed = []
+        monkeypatch.setattr("summarizer.get_summary", lambda request_id: summary)
+        monkeypatch.setattr("summarizer.read_project_entries", lambda request_id, upto: entries)
+        monkeypatch.setattr("summarizer.compress_history", lambda old, new: "new summary")
+        monkeypatch.setattr(
+            "summarizer.commit_summary",
+            lambda request_id, text, version, upto: committed.append(upto) or True,
+        )
+        assert summarize_project("p1")
+        assert committed == ["6-0"]
@@ -0,0 +1,51 @@
+"""Tests for the keyed worker pool used by the manager."""
+
+import threading
+import time
+
+from worker_pool import KeyedWorkerPool
+
+
+class TestKeyedWorkerPool:
+    """Tests for per-key ordering and cross-key parallelism."""
+
+    def test_same_key_is_strictly_ordered(self):
+        """Tasks of one key never overlap and run in submission order."""
+        pool = KeyedWorkerPool(4)
+        seen = []
+
+        def task(idx):
+            time.sleep(0.01 * (3 - idx))
+            seen.append(idx)
+
+        for idx in range(3):
+            pool.submit("req-1", task, idx)
+        assert pool.wait_idle(timeout=5)
+        assert seen == [0, 1, 2]
+        pool.shutdown()
+
+    def test_different_keys_run_in_parallel(self):
+        """A slow project does not hold back another one."""
+        pool = KeyedWorkerPool(2)
+        release = threading.Event()
+        done = []
+
+        pool.submit("slow", release.wait, 5)
+        pool.submit("fast", done.append, "fast")
+        time.sleep(0.1)
+        assert done == ["fast"]
+        assert pool.queue_depth() == 1
+        release.set()
+        assert pool.wait_idle(timeout=5)
+        assert pool.queue_depth() == 0
+        pool.shutdown()
+
+    def test_failing_task_does_not_block_key(self):
+        """An exception is logged and the next task of the key still runs."""
+        pool = KeyedWorkerPool(1)
+        done = []
+        pool.submit("req", lambda: 1 / 0)
+        pool.submit("req", done.append, "ok")
+        assert pool.wait_idle(timeout=5)
+        assert done == ["ok"]
+        pool.shutdown()
@@ -1,11 +1,19 @@
 import os
-import redis
-import google.generativeai as genai
-from dotenv import load_dotenv
-import json
+import time
 import uuid
 from datetime import datetime
 
+import google.generativeai as genai
+import redis
+from dotenv import load_dotenv
+
+import metrics
+from context_budget import drop_replaced_parts, fit_tail, get_context_budget, tail_budget
+from llm_client import LLMClient, LLMError
+from log_writer import LogWriter, exit_on_sigterm
+from payload_store import PayloadStore
+from response_cache import ResponseCache, get_cache_ttl
+
 load_dotenv()
 
 # Environment variable validation
@@ -15,12 +23,160 @@ if missing_vars:
     raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
 r = redis.Redis(
-    host=os.getenv("REDIS_HOST"), port=int(os.getenv("REDIS_PORT")), decode_responses=True
+    host=os.getenv("REDIS_HOST"),
+    port=int(os.getenv("REDIS_PORT")),
+    db=int(os.getenv("REDIS_DB", "0")),
+    decode_responses=True,
 )
+# Même base en octets bruts, pour les payloads compressés
+r_raw = redis.Redis(
+    host=os.getenv("REDIS_HOST"),
+    port=int(os.getenv("REDIS_PORT")),
+    db=int(os.getenv("REDIS_DB", "0")),
+)
+# Flux de contrôle global : ordres, routage et notifications légères
 STREAM_KEY = "table_ronde_stream"
+# Rôles servis par agent_generic.py, chacun avec sa boîte inbox:{role}
+AGENT_ROLES = ("analyst", "architect", "coder", "reviewer")
+# Types dont le contenu voyage sur le flux de contrôle ; les autres n'y laissent qu'une référence
+CONTROL_TYPES = ("order", "cmd", "end")
+# Livrable courant de chaque rôle dans l'index project:{id}:latest
+ARTIFACT_ALIASES = {"analyst": "spec", "architect": "plan", "coder": "code"}
+
+CONTEXT_PAGE_SIZE = 100
+# Rôles dont le contexte inclut toujours le dernier code joint en entier
+CURRENT_CODE_ROLES = ("coder",)
+
+# Rétention : trimming approximatif des flux, TTL des clés d'un projet terminé
+CONTROL_STREAM_MAXLEN = int(os.getenv("CONTROL_STREAM_MAXLEN", "10000"))
+PROJECT_STREAM_MAXLEN = int(os.getenv("PROJECT_STREAM_MAXLEN", "5000"))
+PROJECT_TTL = int(os.getenv("PROJECT_TTL", "86400"))
+PROJECT_KEY_SUFFIXES = (
+    "stream",
+    "sequence",
+    "summary",
+    "latest",
+    "stage",
+    "budget",
+    "fanout",
+    "review",
+)
+FINISHED_PROJECTS_KEY = "projects:finished"
 
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
+llm = LLMClient()
+log_writer = LogWriter()
+exit_on_sigterm()
+response_cache = ResponseCache(r)
+
+# KEYS: séquence, flux projet, flux de contrôle, index des derniers livrables
+# ARGV[1]: "1" si le contenu voyage aussi sur le flux de contrôle
+# ARGV[2], ARGV[3]: MAXLEN approximatif du flux projet et du flux de contrôle
+# ARGV[4]: champs de l'index à pointer sur la nouvelle entrée (séparés par des espaces)
+# ARGV[5..]: paires champ/valeur
+PUBLISH_LUA = """
+local seq = redis.call('INCR', KEYS[1])
+local fields = {'sequence_id', seq}
+local notice = {'sequence_id', seq}
+for i = 5, #ARGV, 2 do
+    fields[#fields + 1] = ARGV[i]
+    fields[#fields + 1] = ARGV[i + 1]
+    if ARGV[i] ~= 'content' or ARGV[1] == '1' then
+        notice[#notice + 1] = ARGV[i]
+        notice[#notice + 1] = ARGV[i + 1]
+    end
+end
+local ref = redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', unpack(fields))
+for name in string.gmatch(ARGV[4], '%S+') do
+    redis.call('HSET', KEYS[4], name, ref)
+end
+notice[#notice + 1] = 'ref'
+notice[#notice + 1] = ref
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[3], '*', unpack(notice))
+if KEYS[5] then
+    redis.call('XADD', KEYS[5], 'MAXLEN', '~', ARGV[3], '*', unpack(notice))
+end
+return {seq, ref}
+"""
+publish_script = r.register_script(PUBLISH_LUA)
+payload_store = PayloadStore(r_raw)
+
+
+def ensure_group(stream_key, group, start_id="$"):
+    """Crée le consumer group (et le stream) s'il n'existe pas encore."""
+    try:
+        r.xgroup_create(stream_key, group, id=start_id, mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def inbox_key(role):
+    """Boîte de réception d'un rôle : uniquement les commandes qui lui sont adressées."""
+    return f"inbox:{role}"
+
+
+def project_stream_key(request_id):
+    """Flux dédié à un projet : les lectures ne coûtent que le trafic de ce projet."""
+    return f"project:{request_id}:stream"
+
+
+def latest_index_key(request_id):
+    return f"project:{request_id}:latest"
+
+
+def get_latest_entry(request_id, name):
+    """Dernière entrée DONE d'un rôle ou d'un livrable ("spec", "plan", "code"), en O(1)."""
+    if not request_id:
+        return None
+    ref = r.hget(latest_index_key(request_id), name)
+    if not ref:
+        return None
+    entries = resolve_entries(r.xrange(project_stream_key(request_id), min=ref, max=ref, count=1))
+    return entries[0][1] if entries else None
+
+
+def get_latest_content(request_id, name):
+    entry = get_latest_entry(request_id, name)
+    return entry.get("content", "") if entry else ""
+
+
+def resolve_entries(entries):
+    """Remplit `content` des entrées dont le corps est dans le payload store (un MGET)."""
+    digests = [
+        data["payload"] for _, data in entries if "content" not in data and "payload" in data
+    ]
+    if digests:
+        bodies = payload_store.get_many(digests)
+        for _, data in entries:
+            if "content" not in data and "payload" in data:
+                data["content"] = bodies.get(data["payload"], data.get("preview", ""))
+    return entries
+
+
+def get_message_content(data):
+    """Contenu d'une entrée du flux de contrôle, lu dans le payload store ou le flux projet."""
+    if "content" in data:
+        return data["content"]
+    if "payload" in data:
+        return resolve_entries([(None, data)])[0][1]["content"]
+    ref = data.get("ref")
+    request_id = data.get("request_id")
+    if not ref or not request_id:
+        return ""
+    entries = resolve_entries(r.xrange(project_stream_key(request_id), min=ref, max=ref, count=1))
+    return entries[0][1].get("content", "") if entries else ""
+
+
+def expire_project(request_id):
+    """Projet terminé : TTL sur ses clés et inscription pour l'archiveur (retention.py)."""
+    pipe = r.pipeline(transaction=False)
+    for suffix in PROJECT_KEY_SUFFIXES:
+        pipe.expire(f"project:{request_id}:{suffix}", PROJECT_TTL)
+    pipe.zadd(FINISHED_PROJECTS_KEY, {request_id: time.time()})
+    pipe.execute()
+
 
 def get_next_sequence(request_id):
     if not request_id:
@@ -29,12 +185,9 @@ def get_next_sequence(request_id):
 
 
 def log_to_disk(request_id, sequence_id, sender, content, msg_type, status):
+    """Empile l'entrée pour le writer de fond : aucune I/O fichier sur le chemin de publication."""
     if not request_id:
         return
-    log_dir = "project_logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    filename = f"{log_dir}/project_{request_id}.jsonl"
     entry = {
         "timestamp": datetime.utcnow().isoformat(),
         "sequence": sequence_id,
@@ -43,86 +196,298 @@ def log_to_disk(request_id, sequence_id, sender, content, msg_type, status):
         "status": status,
         "content": content,
     }
-    with open(filename, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    log_writer.write(request_id, entry)
+    if msg_type == "end":
+        log_writer.close_project(request_id)
+
 
+def publish_chunk(sender, request_id, stream_id, chunk_index, text):
+    """Publie un fragment de réponse en cours (status STREAMING) sur le flux de contrôle.
+
+    Les fragments ne sont ni séquencés, ni copiés dans le flux projet, ni journalisés :
+    seule l'entrée DONE finale (même stream_id) fait partie de l'historique.
+    """
+    r.xadd(
+        STREAM_KEY,
+        {
+            "request_id": request_id,
+            "sender": sender,
+            "type": "chunk",
+            "status": "STREAMING",
+            "stream_id": stream_id,
+            "chunk": chunk_index,
+            "content": text.encode("utf-8", "replace").decode("utf-8"),
+        },
+        maxlen=CONTROL_STREAM_MAXLEN,
+        approximate=True,
+    )
 
-def publish_message(sender, content, msg_type="message", request_id=None, status="DONE"):
-    """Publie sur Redis avec nettoyage UTF-8 pour éviter les crashs Windows."""
-    seq_id = get_next_sequence(request_id)
 
+def _prepare_message(sender, content, msg_type, request_id, status, stream_id, fields=None):
     # Nettoyage des caractères invalides (Surrogates)
     if isinstance(content, str):
         content = content.encode("utf-8", "replace").decode("utf-8")
 
     message = {
         "request_id": request_id if request_id else "",
-        "sequence_id": seq_id,
         "sender": sender,
         "content": content,
         "type": msg_type,
         "status": status,
     }
-    r.xadd(STREAM_KEY, message)
-    log_to_disk(request_id, seq_id, sender, content, msg_type, status)
+    if stream_id:
+        message["stream_id"] = stream_id
+    if fields:
+        message.update(fields)
+    return message
+
+
+def _publish_args(message, inbox=None):
+    """KEYS/ARGV du script de publication pour un message de projet.
+
+    Avec inbox, la notice est aussi déposée dans la boîte de ce rôle.
+    """
+    request_id = message["request_id"]
+    keys = [
+        f"project:{request_id}:sequence",
+        project_stream_key(request_id),
+        STREAM_KEY,
+        latest_index_key(request_id),
+    ]
+    if inbox:
+        keys.append(inbox_key(inbox))
+    index_fields = []
+    # Une partie de fan-out n'est pas le code courant : seule la jointure met l'index à jour
+    if message["status"] == "DONE" and message["type"] != "code_part":
+        index_fields.append(message["sender"])
+        if message["sender"] in ARTIFACT_ALIASES:
+            index_fields.append(ARTIFACT_ALIASES[message["sender"]])
+    args = [
+        "1" if message["type"] in CONTROL_TYPES else "0",
+        PROJECT_STREAM_MAXLEN,
+        CONTROL_STREAM_MAXLEN,
+        " ".join(index_fields),
+    ]
+    for field, value in payload_store.offload(message).items():
+        args.extend([field, value])
+    return keys, args
+
+
+def publish_message(
+    sender,
+    content,
+    msg_type="message",
+    request_id=None,
+    status="DONE",
+    stream_id=None,
+    inbox=None,
+    fields=None,
+):
+    """Publie sur Redis avec nettoyage UTF-8 pour éviter les crashs Windows.
+
+    Séquence, entrée projet, notice de contrôle, index des derniers livrables et inbox sont
+    écrits par un seul script Lua : l'ordre des séquences suit celui du flux. Un aller-retour
+    réseau, plus un pour un contenu déporté dans le payload store (payload_store.offload).
+    inbox : rôle destinataire, qui reçoit la notice dans inbox:{role}.
+    fields : champs supplémentaires de l'entrée (ex. {"file": "main.py"}).
+    """
+    with metrics.PUBLISH_SECONDS.time(sender=sender):
+        message = _prepare_message(sender, content, msg_type, request_id, status, stream_id, fields)
+        if request_id:
+            keys, args = _publish_args(message, inbox)
+            seq_id, _ref = publish_script(keys=keys, args=args)
+        else:
+            seq_id = 0
+            message["sequence_id"] = seq_id
+            r.xadd(
+                STREAM_KEY,
+                payload_store.offload(message),
+                maxlen=CONTROL_STREAM_MAXLEN,
+                approximate=True,
+            )
+        if msg_type == "end" and request_id:
+            expire_project(request_id)
+        log_to_disk(request_id, seq_id, sender, message["content"], msg_type, status)
+    metrics.MESSAGES.inc(sender=sender, type=msg_type)
+    return seq_id
+
+
+def publish_messages(messages):
+    """Publie plusieurs messages en un seul aller-retour (pipeline de scripts).
+
+    Chaque contenu déporté dans le payload store ajoute un aller-retour (offload).
+
+    messages : liste de dicts avec les arguments de publish_message.
+    """
+    prepared = []
+    with r.pipeline(transaction=False) as pipe:
+        for kwargs in messages:
+            message = _prepare_message(
+                kwargs["sender"],
+                kwargs["content"],
+                kwargs.get("msg_type", "message"),
+                kwargs.get("request_id"),
+                kwargs.get("status", "DONE"),
+                kwargs.get("stream_id"),
+                kwargs.get("fields"),
+            )
+            if message["request_id"]:
+                keys, args = _publish_args(message, kwargs.get("inbox"))
+                publish_script(keys=keys, args=args, client=pipe)
+            else:
+                message["sequence_id"] = 0
+                pipe.xadd(
+                    STREAM_KEY,
+                    payload_store.offload(message),
+                    maxlen=CONTROL_STREAM_MAXLEN,
+                    approximate=True,
+                )
+            prepared.append(message)
+        results = pipe.execute()
+
+    seq_ids = []
+    for message, result in zip(prepared, results):
+        seq_id = result[0] if message["request_id"] else 0
+        log_to_disk(
+            message["request_id"] or None,
+            seq_id,
+            message["sender"],
+            message["content"],
+            message["type"],
+            message["status"],
+        )
+        if message["type"] == "end" and message["request_id"]:
+            expire_project(message["request_id"])
+        metrics.MESSAGES.inc(sender=message["sender"], type=message["type"])
+        seq_ids.append(seq_id)
+    return seq_ids
 
 
 def compress_history(current_summary, new_messages_text):
-    """Compression optimisée 'Token Saver' : Faits techniques uniquement."""
-    model = genai.GenerativeModel(os.getenv("MODEL_FAST"))
+    """Compression optimisée 'Token Saver' : Faits techniques uniquement.
+
+    Renvoie None en cas d'échec pour que l'appelant n'avance pas son curseur.
+    """
+    model_name = os.getenv("MODEL_FAST")
     prompt = f"""
     TASK: Compress logs into a dense technical state.
     CONSTRAINTS: Bullet points only. No conversational text. Keep filenames, tech stack, and status.
-    
+
     OLD_STATE: {current_summary}
     NEW_EVENTS: {new_messages_text}
     """
+    ttl = get_cache_ttl("summarizer")
+    cache_key = response_cache.make_key(model_name, prompt)
+    if ttl > 0:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
     try:
-        return model.generate_content(prompt).text
-    except Exception as e:
+        summary = llm.generate(model_name, prompt, role="summarizer")
+    except LLMError as e:
         print(f"Compression error: {e}", flush=True)
-        return current_summary
+        return None
+    response_cache.set(cache_key, summary, ttl)
+    return summary
 
 
-def build_smart_context(request_id):
-    """Mémoire glissante avec compression automatique."""
-    if not request_id:
-        return "No context."
-    summary_key = f"project:{request_id}:summary"
-    last_read_key = f"project:{request_id}:last_read_id"
+def read_project_entries(request_id, after_id="0-0"):
+    """Lit toutes les entrées d'un projet strictement après after_id, page par page."""
+    key = project_stream_key(request_id)
+    entries = []
+    cursor = after_id
+    while True:
+        page = r.xrange(key, min=f"({cursor}", max="+", count=CONTEXT_PAGE_SIZE)
+        entries.extend(page)
+        if len(page) < CONTEXT_PAGE_SIZE:
+            return resolve_entries(entries)
+        cursor = page[-1][0]
+
+
+def summary_key(request_id):
+    return f"project:{request_id}:summary"
+
+
+def get_summary(request_id):
+    """Dernier résumé prêt : texte, version et ID de la dernière entrée couverte."""
+    data = r.hgetall(summary_key(request_id))
+    return {
+        "text": data.get("text") or "Start.",
+        "version": int(data.get("version") or 0),
+        "upto": data.get("upto") or "0-0",
+    }
+
+
+def commit_summary(request_id, summary, version, upto_id):
+    """Enregistre le résumé version+1 couvrant tout jusqu'à upto_id.
+
+    Échoue (False) si un autre résumeur a déjà publié une version depuis `version`.
+    """
+    key = summary_key(request_id)
+    with r.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if int(pipe.hget(key, "version") or 0) != version:
+                return False
+            pipe.multi()
+            pipe.hset(key, mapping={"text": summary, "version": version + 1, "upto": upto_id})
+            pipe.execute()
+            return True
+        except redis.WatchError:
+            return False
+
 
-    stored_summary = r.get(summary_key) or "Start."
-    last_read_id = r.get(last_read_key) or "0-0"
+def format_entry(data):
+    return f"[{data['sender'].upper()}]: {data['content']}"
 
-    new_stream = r.xread({STREAM_KEY: last_read_id}, count=100)
-    new_msgs = []
 
-    if new_stream:
-        for msg in new_stream[0][1]:
-            data = msg[1]
-            if data.get("request_id") == request_id:
-                new_msgs.append(f"[{data['sender'].upper()}]: {data['content']}")
+def build_smart_context(request_id, role=None):
+    """Dernier résumé prêt + queue récente, dans le budget de tokens du rôle.
 
-    if len(new_msgs) > 8:  # Seuil de compression
-        to_compress = new_msgs[:-4]
-        to_keep = new_msgs[-4:]
-        new_summary = compress_history(stored_summary, "\n".join(to_compress))
-        r.set(summary_key, new_summary)
+    Ne compresse jamais : le résumé est tenu à jour en arrière-plan par summarizer.py.
+    Les entrées qui ne tiennent pas sont signalées puis laissées au résumeur.
+    """
+    with metrics.CONTEXT_SECONDS.time():
+        return _build_smart_context(request_id, role)
 
-        return f"=== STATE ===\n{new_summary}\n=== RECENT ===\n" + "\n".join(to_keep)
-    else:
-        return f"=== STATE ===\n{stored_summary}\n=== RECENT ===\n" + "\n".join(new_msgs)
 
+def _build_smart_context(request_id, role=None):
+    if not request_id:
+        return "No context."
+    summary = get_summary(request_id)
+    entries = drop_replaced_parts(read_project_entries(request_id, summary["upto"]))
+    current = ""
+    if role in CURRENT_CODE_ROLES:
+        # Le code à corriger est donné en entier, hors budget (comme pour le reviewer)
+        ref = r.hget(latest_index_key(request_id), "code")
+        if ref:
+            entries = [entry for entry in entries if entry[0] != ref]
+            current = f"=== CURRENT CODE ===\n{get_latest_content(request_id, 'code')}\n"
+    # Le résumé passe en premier ; même calcul que le déclenchement du résumeur
+    budget = tail_budget(get_context_budget(role), summary["text"])
+    overflow, lines = fit_tail(entries, budget, format_entry)
+    if overflow:
+        lines.insert(0, f"[{len(overflow)} older messages pending summary]")
+    return f"=== STATE ===\n{summary['text']}\n{current}=== RECENT ===\n" + "\n".join(lines)
 
-def get_ai_response(role, prompt, full_context=""):
+
+def get_ai_response(role, prompt, full_context="", on_chunk=None):
+    """Réponse du modèle du rôle. Lève LLMError en cas d'échec définitif.
+
+    on_chunk active le streaming (non appelé si la réponse vient du cache).
+    """
     model_name = (
         os.getenv("MODEL_SMART")
         if role in ["manager", "analyst", "architect"]
         else os.getenv("MODEL_FAST")
     )
-    try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(f"{full_context}\n\nTASK FOR {role.upper()}: {prompt}")
-        return response.text
-    except Exception as e:
-        return f"AI ERROR: {e}"
+    full_prompt = f"{full_context}\n\nTASK FOR {role.upper()}: {prompt}"
+    ttl = get_cache_ttl(role)
+    cache_key = response_cache.make_key(model_name, full_prompt)
+    if ttl > 0:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    text = llm.generate(model_name, full_prompt, on_chunk=on_chunk, role=role)
+    response_cache.set(cache_key, text, ttl)
+    return text
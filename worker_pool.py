@@ -0,0 +1,80 @@
+"""Pool de threads à clés : ordre strict par clé, parallélisme entre clés."""
+
+import queue
+import threading
+from collections import deque
+
+_STOP = object()
+
+
+class KeyedWorkerPool:
+    """Exécute les tâches soumises avec la même clé une par une, dans l'ordre.
+
+    Une clé n'est jamais prise par deux workers à la fois : elle ne revient dans la file
+    des clés prêtes qu'une fois sa tâche en cours terminée. Des clés différentes avancent
+    en parallèle sur `size` threads.
+    """
+
+    def __init__(self, size, name="worker"):
+        self.size = size
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.pending = {}
+        self.ready = queue.Queue()
+        self.threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(size)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, key, fn, *args):
+        with self.lock:
+            tasks = self.pending.get(key)
+            if tasks is None:
+                self.pending[key] = deque([(fn, args)])
+                self.ready.put(key)
+            else:
+                tasks.append((fn, args))
+
+    def queue_depth(self):
+        """Nombre de tâches en attente ou en cours."""
+        with self.lock:
+            return sum(len(tasks) for tasks in self.pending.values())
+
+    def active_keys(self):
+        with self.lock:
+            return len(self.pending)
+
+    def wait_idle(self, timeout=None):
+        """Attend que toutes les tâches soumises soient terminées."""
+        with self.idle:
+            return self.idle.wait_for(lambda: not self.pending, timeout)
+
+    def shutdown(self, wait=True):
+        for _ in self.threads:
+            self.ready.put(_STOP)
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            key = self.ready.get()
+            if key is _STOP:
+                return
+            with self.lock:
+                fn, args = self.pending[key][0]
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Err [{key}]: {e}", flush=True)
+            with self.lock:
+                tasks = self.pending[key]
+                tasks.popleft()
+                if tasks:
+                    self.ready.put(key)
+                else:
+                    del self.pending[key]
+                    if not self.pending:
+                        self.idle.notify_all()